@@ -0,0 +1,167 @@
+import json
+import os
+import queue
+import random
+import smtplib
+import threading
+import time
+import urllib.request
+from collections import OrderedDict
+from email.message import EmailMessage
+from typing import List
+
+# --- NOTIFICATIONS ---
+# Shared by api/index.py and legacy/app.py, so it must stay standard-library only and must
+# not import the FastAPI app (legacy/deploy.py uploads it next to the Gradio app).
+# The leading underscore keeps Vercel from deploying it as a function of its own.
+#
+# Approval emails go out over SMTP to ADMIN_TEAM; both must be set explicitly, there are
+# no default recipients. scripts/notify_check.py runs the dispatcher against a local SMTP
+# stand-in (and `--serve` runs just the stand-in) to test without a real mailbox.
+SMTP_HOST = os.environ.get("SMTP_HOST")
+SMTP_PORT = int(os.environ.get("SMTP_PORT", "587"))
+SMTP_USER = os.environ.get("SMTP_USER")
+SMTP_PASSWORD = os.environ.get("SMTP_PASSWORD")
+SMTP_FROM = os.environ.get("SMTP_FROM", SMTP_USER or "venue-booking@spjimr.org")
+SMTP_STARTTLS = os.environ.get("SMTP_STARTTLS", "1" if SMTP_USER else "0") == "1"
+ADMIN_TEAM = [a.strip() for a in os.environ.get("ADMIN_TEAM", "").split(",") if a.strip()]
+if SMTP_HOST and not ADMIN_TEAM:
+    print("SMTP_HOST is set but ADMIN_TEAM is empty; approval emails will not be sent.")
+# Game invites are POSTed as JSON ({"to", "text"}) to a WhatsApp gateway webhook.
+WHATSAPP_WEBHOOK_URL = os.environ.get("WHATSAPP_WEBHOOK_URL")
+WHATSAPP_RECIPIENTS = [r.strip() for r in os.environ.get("WHATSAPP_RECIPIENTS", "").split(",") if r.strip()]
+
+NOTIFY_WORKERS = int(os.environ.get("NOTIFY_WORKERS", "2"))
+NOTIFY_BATCH_WINDOW = float(os.environ.get("NOTIFY_BATCH_WINDOW", "2"))
+NOTIFY_MAX_RETRIES = int(os.environ.get("NOTIFY_MAX_RETRIES", "4"))
+NOTIFY_QUEUE_SIZE = int(os.environ.get("NOTIFY_QUEUE_SIZE", "1000"))
+# Background worker threads need a long-lived process. A serverless instance can be frozen
+# as soon as the response is sent, so there (VERCEL) messages are held until the request
+# flushes them with `notifier.flush`, e.g. from a BackgroundTask on its response.
+NOTIFY_INLINE = os.environ.get("NOTIFY_INLINE", "1" if os.environ.get("VERCEL") else "0") == "1"
+
+def send_email(recipient: str, subject: str, body: str):
+    msg = EmailMessage()
+    msg["From"] = SMTP_FROM
+    msg["To"] = recipient
+    msg["Subject"] = subject
+    msg.set_content(body)
+    with smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=10) as smtp:
+        if SMTP_STARTTLS:
+            smtp.starttls()
+        if SMTP_USER and SMTP_PASSWORD:
+            smtp.login(SMTP_USER, SMTP_PASSWORD)
+        smtp.send_message(msg)
+
+def send_whatsapp(recipient: str, subject: str, body: str):
+    payload = json.dumps({"to": recipient, "text": body}).encode()
+    req = urllib.request.Request(WHATSAPP_WEBHOOK_URL, data=payload, headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(req, timeout=10) as resp:
+        resp.read()
+
+SENDERS = {"email": send_email, "whatsapp": send_whatsapp}
+
+class NotificationDispatcher:
+    """Background worker pool that delivers notifications off the request path.
+
+    `submit` never blocks: messages are queued (or dropped with a log line when the
+    queue is full). Each worker collects whatever arrives within `batch_window`,
+    merges messages for the same recipient into one, and retries failed sends with
+    exponential backoff.
+
+    With `inline`, no threads are started: `submit` only holds the message and
+    `flush` delivers everything held so far in the calling thread.
+    """
+
+    def __init__(self, workers: int, batch_window: float, max_retries: int, queue_size: int, inline: bool = False):
+        self.workers = max(1, workers)
+        self.batch_window = batch_window
+        self.max_retries = max_retries
+        self.inline = inline
+        self.queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self.threads: List[threading.Thread] = []
+        self.lock = threading.Lock()
+
+    def start(self):
+        with self.lock:
+            if self.threads:
+                return
+            for i in range(self.workers):
+                t = threading.Thread(target=self._worker, name=f"notify-{i}", daemon=True)
+                t.start()
+                self.threads.append(t)
+
+    def submit(self, channel: str, recipient: str, subject: str, body: str):
+        if not self.inline:
+            self.start()
+        try:
+            self.queue.put_nowait((channel, recipient, subject, body))
+        except queue.Full:
+            print(f"Notification dropped ({channel} -> {recipient}): queue full")
+
+    def flush(self):
+        """Delivers every held message now (inline mode)."""
+        batch = []
+        while True:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        self._deliver_batch(batch)
+
+    def join(self):
+        """Blocks until every queued notification has been delivered or given up on."""
+        if self.inline:
+            self.flush()
+        self.queue.join()
+
+    def _worker(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.batch_window
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._deliver_batch(batch)
+
+    def _deliver_batch(self, batch):
+        grouped = OrderedDict()
+        for channel, recipient, subject, body in batch:
+            grouped.setdefault((channel, recipient), []).append((subject, body))
+        for (channel, recipient), messages in grouped.items():
+            self._deliver(channel, recipient, messages)
+        for _ in batch:
+            self.queue.task_done()
+
+    def _deliver(self, channel: str, recipient: str, messages):
+        if len(messages) == 1:
+            subject, body = messages[0]
+        else:
+            subject = f"{len(messages)} Venue Reservation Requests"
+            body = "\n\n----------\n\n".join(f"{s}\n\n{b}" if s else b for s, b in messages)
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                SENDERS[channel](recipient, subject, body)
+                return
+            except Exception as e:
+                if attempt == self.max_retries:
+                    print(f"Notification failed ({channel} -> {recipient}) after {attempt + 1} attempts: {e}")
+                    return
+                time.sleep(min(60, 2 ** attempt) + random.random())
+
+notifier = NotificationDispatcher(NOTIFY_WORKERS, NOTIFY_BATCH_WINDOW, NOTIFY_MAX_RETRIES, NOTIFY_QUEUE_SIZE, NOTIFY_INLINE)
+
+def notify_admins(draft: str):
+    """Queues a "Subject: ...\n\nbody" draft for every ADMIN_TEAM address."""
+    if not SMTP_HOST or not ADMIN_TEAM:
+        return
+    subject, _, body = draft.partition("\n\n")
+    subject = subject.replace("Subject: ", "", 1)
+    for recipient in ADMIN_TEAM:
+        notifier.submit("email", recipient, subject, body)
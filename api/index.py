@@ -1,82 +1,279 @@
+import time
+_IMPORT_STARTED = time.perf_counter()
+
 import os
-import pandas as pd
 import calendar
-from datetime import date as dt_date, datetime
-from fastapi import FastAPI, Request, Form, HTTPException
-from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
+import importlib
+from datetime import date as dt_date, datetime, timedelta, timezone
 from typing import List, Optional
+from collections import OrderedDict, deque
+from email.utils import format_datetime, parsedate_to_datetime
+import asyncio
+import hashlib
+import hmac
+import ipaddress
+import json
+import mmap
+import re
+import struct
+import threading
 import urllib.parse
-from supabase import create_client, Client
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+# --- COLD START ---
+# COLD_START_PROFILE=1 records an import-time and first-request breakdown, printed once
+# and served at /api/cold-start. PREWARM=1 initializes the lazy resources in a
+# background thread right after import instead of on the first request that needs them.
+COLD_START_PROFILE = os.environ.get("COLD_START_PROFILE") == "1"
+PREWARM = os.environ.get("PREWARM") == "1"
+cold_start = {"import_ms": {}, "resources_ms": {}, "first_request": None}
+
+def mark_import(stage: str):
+    cold_start["import_ms"][stage] = round((time.perf_counter() - _IMPORT_STARTED) * 1000, 2)
+
+class LazyResource:
+    """Builds an expensive module-level resource on first use.
+
+    Attribute access is forwarded to the built object, and truthiness is the truthiness
+    of the built object. That way `if supabase:` and `pd.concat(...)` keep working unchanged.
+    """
+
+    def __init__(self, name: str, factory):
+        self._name = name
+        self._factory = factory
+        self._value = None
+        self._ready = False
+        self._lock = threading.Lock()
+
+    def get(self):
+        if not self._ready:
+            with self._lock:
+                if not self._ready:
+                    started = time.perf_counter()
+                    self._value = self._factory()
+                    self._ready = True
+                    cold_start["resources_ms"][self._name] = round((time.perf_counter() - started) * 1000, 2)
+        return self._value
+
+    def __getattr__(self, attr):
+        return getattr(self.get(), attr)
+
+    def __bool__(self):
+        return bool(self.get())
+
+pd = LazyResource("pandas", lambda: importlib.import_module("pandas"))
+
+mark_import("stdlib")
+
+# Timed on its own: FastAPI and Starlette (with pydantic) are most of a cold import.
+from fastapi import FastAPI, Request, Form, HTTPException
+from fastapi.responses import HTMLResponse, RedirectResponse, Response, StreamingResponse
+from fastapi.staticfiles import StaticFiles
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+
+mark_import("fastapi_starlette")
 
 app = FastAPI()
 
 # --- CONFIGURATION ---
-if os.environ.get("VERCEL"):
+if os.environ.get("BOOKINGS_FILE"):
+    BOOKINGS_FILE = os.environ["BOOKINGS_FILE"]
+elif os.environ.get("VERCEL"):
     BOOKINGS_FILE = "/tmp/bookings.csv"
-    if not os.path.exists("/tmp"):
-        os.makedirs("/tmp", exist_ok=True)
 else:
     BOOKINGS_FILE = "bookings.csv"
 
 SUPABASE_URL = os.environ.get("SUPABASE_URL")
 SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
-supabase: Optional[Client] = None
-if SUPABASE_URL and SUPABASE_KEY:
+# Maintenance RPCs (archive_bookings) are not executable with the anon key; they need the service key.
+SUPABASE_SERVICE_KEY = os.environ.get("SUPABASE_SERVICE_KEY")
+
+def create_supabase_client(key=SUPABASE_KEY):
+    if not (SUPABASE_URL and key):
+        return None
     try:
-        supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+        from supabase import create_client
+        return create_client(SUPABASE_URL, key)
     except Exception as e:
         print(f"Supabase init error: {e}")
+        return None
+
+# The clients are created on first use; falsy when Supabase is not configured or failed to initialize.
+supabase = LazyResource("supabase", create_supabase_client)
+supabase_service = LazyResource("supabase_service", lambda: create_supabase_client(SUPABASE_SERVICE_KEY))
+
+mark_import("configuration")
 
-CATEGORIES = {
-    "sports": {
-        "title": "Sports Hub",
-        "description": "Rec Centre & Outdoor Courts",
-        "accent": "orange",
-        "venues": [
-            "Rec Centre - 1st Floor", "Rec Centre - Squash Court 1", "Rec Centre - Squash Court 2",
-            "Rec Centre - Yoga Room", "Rec Centre - Table Tennis Table1", "Rec Centre - Table Tennis Table2",
-            "Rec Centre - Table Tennis Table3", "Rec Centre - Pool Table", "Rec Centre - Terrace (Pickleball)",
-            "Rec Centre - Terrace (Cricket)", "AH Wadia School (Basketball)", "B30 Volleyball Court",
-            "Other (Manual Entry)"
-        ],
-        "draft_label": "Whatsapp Game Invite",
-        "draft_type": "whatsapp"
-    },
-    "cultural": {
-        "title": "Cultural Hub",
-        "description": "Auditoriums & Event Spaces",
-        "accent": "purple",
-        "venues": [
-            "MLS Auditorium", "Gyan Auditorium", "Yoga Room", 
-            "Recess Area near Acad Block", "Other (Manual Entry)"
-        ],
-        "draft_label": "Email Approval Draft",
-        "draft_type": "email"
-    },
-    "academic": {
-        "title": "Academic Hub",
-        "description": "NCR Rooms & PD Blocks",
-        "accent": "blue",
-        "venues": [
-            "B Block - Room 101", "B Block - Room 102",
-            "C Block - Room 201", "C Block - Room 202", "D Block - Room 301", "D Block - Room 302",
-            "Dome 1", "Dome 2", "Dome 3", "NCR 1", "NCR 2", "NCR 3", "NCR 4", "NCR 5",
-            "NCR 6", "NCR 7", "NCR 8", "Other (Manual Entry)"
-        ],
-        "types": ["Class Adda", "PD Club Session"],
-        "draft_label": "Email Approval Draft",
-        "draft_type": "email"
+# --- VENUE CATALOG ---
+# Categories, venues and booking rules live in VENUE_CATALOG_FILE (config/venues.json).
+# Each venue may be a plain name or {"name", "slots", "closures"}; closures refer to the
+# named rules under "closures". A category's "manual_closures" lists the rules that apply to
+# manually entered names containing one of the rule's "match" strings (any name if it has
+# none). The file is re-read when its mtime changes, checked at most every
+# VENUE_CATALOG_CHECK_INTERVAL seconds, so edits apply without a redeploy.
+VENUE_CATALOG_FILE = os.environ.get(
+    "VENUE_CATALOG_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "config", "venues.json"))
+VENUE_CATALOG_CHECK_INTERVAL = float(os.environ.get("VENUE_CATALOG_CHECK_INTERVAL", "2"))
+MANUAL_ENTRY = "Other (Manual Entry)"
+WEEKDAYS = {name: i for i, name in enumerate(calendar.day_name)}
+
+def closed_days(rules) -> dict:
+    """Merges closure rules into {weekday: message}."""
+    closed = {}
+    for rule in rules:
+        for day in rule["weekdays"]:
+            closed.setdefault(day, rule["message"])
+    return closed
+
+def build_catalog(raw: dict) -> dict:
+    """Precomputes the lookups that booking validation needs from the parsed catalog file."""
+    time_slots = list(raw["time_slots"])
+    closures = {
+        name: {"weekdays": {WEEKDAYS[day] for day in rule["weekdays"]}, "message": rule["message"],
+               "label": rule.get("label", rule["message"]), "match": tuple(rule.get("match", ()))}
+        for name, rule in raw.get("closures", {}).items()
     }
-}
+    categories, venue_category, venue_slots, venue_closures, manual_rules = {}, {}, {}, {}, {}
+    # weekday -> [{"label", "category"}], for the calendar's closure notes.
+    weekday_closures, noted = {}, set()
+
+    def note(rule_name, category):
+        if (rule_name, category) not in noted:
+            noted.add((rule_name, category))
+            for day in closures[rule_name]["weekdays"]:
+                weekday_closures.setdefault(day, []).append({"label": closures[rule_name]["label"], "category": category})
 
-TIME_SLOTS = [
-    "08:00 AM - 10:00 AM", "10:00 AM - 12:00 PM",
-    "12:00 PM - 02:00 PM", "02:00 PM - 04:00 PM",
-    "04:00 PM - 06:00 PM", "06:00 PM - 08:00 PM",
-    "08:00 PM - 10:00 PM", "10:00 PM - 12:00 AM"
-]
+    for category, config in raw["categories"].items():
+        manual_rules[category] = [closures[rule] for rule in config.get("manual_closures", [])]
+        for rule in config.get("manual_closures", []):
+            note(rule, category)
+        venues = []
+        for venue in config["venues"]:
+            spec = {"name": venue} if isinstance(venue, str) else venue
+            name = spec["name"]
+            venues.append(name)
+            venue_category.setdefault(name, category)
+            venue_slots[name] = frozenset(spec.get("slots", time_slots))
+            venue_closures[name] = closed_days(closures[rule] for rule in spec.get("closures", []))
+            for rule in spec.get("closures", []):
+                note(rule, category)
+        if config.get("manual_entry"):
+            venues.append(MANUAL_ENTRY)
+        categories[category] = {k: v for k, v in config.items() if k not in ("venues", "manual_entry", "manual_closures")}
+        categories[category]["venues"] = venues
+
+    # A manual entry that names a catalog venue gets that venue's closures plus the category's
+    # matching manual rules, resolved here so validation stays a lookup. Only names outside
+    # the catalog are matched against the manual rules per booking.
+    manual_closures = {
+        category: {
+            name: {**closed_days(r for r in rules if not r["match"] or any(m in name for m in r["match"])),
+                   **venue_closures[name]}
+            for name in venue_category
+        }
+        for category, rules in manual_rules.items()
+    }
+    return {
+        "categories": categories,
+        "time_slots": time_slots,
+        "all_slots": frozenset(time_slots),
+        "venue_category": venue_category,
+        "venue_slots": venue_slots,
+        "venue_closures": venue_closures,
+        "manual_rules": manual_rules,
+        "manual_closures": manual_closures,
+        "weekday_closures": weekday_closures,
+    }
+
+class VenueCatalog:
+    """The current catalog, swapped whole on reload so readers never see a half-built one."""
+
+    def __init__(self, path: str, check_interval: float):
+        self.path = path
+        self.check_interval = check_interval
+        self.lock = threading.Lock()
+        self.mtime = None
+        self.checked_at = 0.0
+        self.data = None
+        self.reload()
+        if self.data is None:
+            raise RuntimeError(f"Venue catalog {path} could not be loaded")
+
+    def reload(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError as e:
+            print(f"Venue catalog load error ({self.path}): {e!r}")
+            return
+        if mtime == self.mtime:
+            return
+        # Remember the mtime even if parsing fails, so a broken edit is logged once; the
+        # last good catalog keeps serving until the file is fixed.
+        self.mtime = mtime
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                self.data = build_catalog(json.load(f))
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Venue catalog load error ({self.path}): {e!r}")
+
+    def current(self) -> dict:
+        now = time.monotonic()
+        if now - self.checked_at >= self.check_interval:
+            with self.lock:
+                if now - self.checked_at >= self.check_interval:
+                    self.checked_at = now
+                    self.reload()
+        return self.data
+
+    @property
+    def categories(self) -> dict:
+        return self.current()["categories"]
+
+    @property
+    def time_slots(self) -> list:
+        return self.current()["time_slots"]
+
+    def validate(self, category: str, venue: str, final_venue: str, date: str, time_slot: str) -> Optional[str]:
+        """Returns why a booking is not allowed, or None. Every check is a dict/set lookup, except
+        that a manually entered name outside the catalog is matched against the category's
+        manual_closures rules."""
+        data = self.current()
+        config = data["categories"].get(category)
+        if config is None:
+            return "Unknown category"
+        try:
+            weekday = datetime.strptime(date, "%Y-%m-%d").weekday()
+        except ValueError:
+            return f"Invalid date: {date}"
+        if venue == MANUAL_ENTRY:
+            if MANUAL_ENTRY not in config["venues"]:
+                return f"{config['title']} does not accept manually entered venues"
+        elif data["venue_category"].get(venue) != category:
+            return f"{venue} is not a {config['title']} venue"
+        # Manually entered names that match a catalog venue get that venue's rules.
+        if time_slot not in data["venue_slots"].get(final_venue, data["all_slots"]):
+            return f"{time_slot} is not bookable at {final_venue}"
+        if venue != MANUAL_ENTRY:
+            closed = data["venue_closures"][venue]
+        else:
+            closed = data["manual_closures"][category].get(final_venue)
+            if closed is None:
+                closed = closed_days(rule for rule in data["manual_rules"][category]
+                                     if weekday in rule["weekdays"]
+                                     and (not rule["match"] or any(m in final_venue for m in rule["match"])))
+        if weekday in closed:
+            return f"{closed[weekday]} (Venue: {final_venue})"
+        return None
+
+catalog = VenueCatalog(VENUE_CATALOG_FILE, VENUE_CATALOG_CHECK_INTERVAL)
+
+mark_import("venue_catalog")
 
 # --- HOLIDAY CONFIG ---
 GOVT_HOLIDAYS = {
@@ -91,36 +288,587 @@ GOVT_HOLIDAYS = {
 }
 
 # --- SETUP ---
-templates = Jinja2Templates(directory="templates")
-if not os.path.exists("static"):
-    os.makedirs("static", exist_ok=True)
-app.mount("/static", StaticFiles(directory="static"), name="static")
+def create_templates():
+    from fastapi.templating import Jinja2Templates
+    return Jinja2Templates(directory="templates")
+
+templates = LazyResource("templates", create_templates)
+# check_dir=False: the directory is only looked at when a static file is requested.
+app.mount("/static", StaticFiles(directory="static", check_dir=False), name="static")
+
+# --- RATE LIMITING & ADMISSION ---
+# Token buckets per client IP and, separately, per requester name: RATE_LIMIT_BURST requests
+# at once, refilled at RATE_LIMIT_PER_MINUTE. A write needs a token from both buckets.
+RATE_LIMIT_BURST = int(os.environ.get("RATE_LIMIT_BURST", "5"))
+RATE_LIMIT_PER_MINUTE = float(os.environ.get("RATE_LIMIT_PER_MINUTE", "20"))
+# X-Forwarded-For is only honoured when the direct peer is a trusted proxy: a comma-separated
+# list of addresses/networks, or "*" for any peer (Vercel, whose edge overwrites the header).
+TRUSTED_PROXIES = os.environ.get("TRUSTED_PROXIES", "*" if os.environ.get("VERCEL") else "")
+# Writes allowed to run at once, how many may wait behind them, and how long a waiter may wait.
+# CSV writes are read-modify-write on a single file, so they default to running one at a time.
+ADMISSION_CONCURRENCY = int(os.environ.get("ADMISSION_CONCURRENCY", "4" if SUPABASE_URL and SUPABASE_KEY else "1"))
+ADMISSION_QUEUE_SIZE = int(os.environ.get("ADMISSION_QUEUE_SIZE", "32"))
+ADMISSION_TIMEOUT = float(os.environ.get("ADMISSION_TIMEOUT", "5"))
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, capacity: float):
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+class RateLimiter:
+    def __init__(self, capacity: int, per_minute: float, max_keys: int = 10000):
+        self.capacity = capacity
+        self.rate = per_minute / 60.0
+        self.max_keys = max_keys
+        self.buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    def _refill(self, key: str, now: float) -> TokenBucket:
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = TokenBucket(self.capacity)
+            if len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(key)
+            bucket.tokens = min(self.capacity, bucket.tokens + (now - bucket.updated) * self.rate)
+        bucket.updated = now
+        return bucket
+
+    def check(self, *keys: str):
+        """Takes one token from each bucket in `keys`, raising a 429 with Retry-After if any is empty.
+
+        Nothing is taken unless every bucket has a token, so a request rejected on one key
+        does not also drain the others.
+        """
+        now = time.monotonic()
+        buckets = [self._refill(key, now) for key in dict.fromkeys(keys)]
+        empty = [b for b in buckets if b.tokens < 1]
+        if empty:
+            deficit = max(1 - b.tokens for b in empty)
+            retry_after = max(1, int(deficit / self.rate) + 1) if self.rate else 60
+            raise HTTPException(status_code=429, detail="Too many requests. Please slow down.",
+                                headers={"Retry-After": str(retry_after)})
+        for bucket in buckets:
+            bucket.tokens -= 1
+
+class AdmissionQueue:
+    """Bounded admission for write requests.
+
+    At most `concurrency` requests run at once. Waiters are queued per key and served
+    round-robin across keys (client IPs), so one client flooding submit cannot starve the others.
+    When the queue is full, or a waiter times out, the request fails fast with a 429.
+    """
+
+    def __init__(self, concurrency: int, max_waiting: int, timeout: float):
+        self.concurrency = max(1, concurrency)
+        self.max_waiting = max_waiting
+        # No single key may hold more than a quarter of the queue.
+        self.max_waiting_per_key = max(1, max_waiting // 4)
+        self.timeout = timeout
+        self.active = 0
+        self.waiting = 0
+        self.waiters: "OrderedDict[str, deque]" = OrderedDict()
+
+    def _reject(self, message: str):
+        raise HTTPException(status_code=429, detail=message, headers={"Retry-After": str(max(1, int(self.timeout)))})
+
+    def _wake_next(self):
+        while self.waiters:
+            key, queue = next(iter(self.waiters.items()))
+            fut = queue.popleft()
+            if queue:
+                self.waiters.move_to_end(key)
+            else:
+                del self.waiters[key]
+            self.waiting -= 1
+            if not fut.done():
+                fut.set_result(None)
+                return
+        self.active -= 1
+
+    async def acquire(self, key: str):
+        if self.active < self.concurrency and not self.waiters:
+            self.active += 1
+            return
+        if self.waiting >= self.max_waiting or len(self.waiters.get(key, ())) >= self.max_waiting_per_key:
+            self._reject("Server is busy. Please try again shortly.")
+
+        fut = asyncio.get_running_loop().create_future()
+        self.waiters.setdefault(key, deque()).append(fut)
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(fut, self.timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as exc:
+            # The slot may have been handed over just as we gave up; pass it on.
+            if fut.done() and not fut.cancelled():
+                self._wake_next()
+            else:
+                queue = self.waiters.get(key)
+                if queue and fut in queue:
+                    queue.remove(fut)
+                    self.waiting -= 1
+                    if not queue:
+                        del self.waiters[key]
+            if isinstance(exc, asyncio.CancelledError):
+                raise
+            self._reject("Request timed out waiting for a free slot. Please try again.")
+
+    def release(self):
+        self._wake_next()
+
+    async def run(self, key: str, func, *args):
+        """Admits `key`, then runs the blocking `func` in the threadpool."""
+        await self.acquire(key)
+        try:
+            return await run_in_threadpool(func, *args)
+        finally:
+            self.release()
+
+rate_limiter = RateLimiter(RATE_LIMIT_BURST, RATE_LIMIT_PER_MINUTE)
+admission = AdmissionQueue(ADMISSION_CONCURRENCY, ADMISSION_QUEUE_SIZE, ADMISSION_TIMEOUT)
+
+mark_import("rate_limiting")
+
+def parse_trusted_proxies(value: str):
+    if value.strip() == "*":
+        return "*"
+    networks = []
+    for item in value.split(","):
+        if item.strip():
+            try:
+                networks.append(ipaddress.ip_network(item.strip(), strict=False))
+            except ValueError:
+                print(f"Ignoring invalid TRUSTED_PROXIES entry: {item.strip()}")
+    return networks
+
+trusted_proxies = parse_trusted_proxies(TRUSTED_PROXIES)
+
+def is_trusted_proxy(host: str) -> bool:
+    if trusted_proxies == "*":
+        return True
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(address in network for network in trusted_proxies)
+
+def client_ip(request: Request) -> str:
+    """The caller's address. X-Forwarded-For is read right to left, skipping trusted proxies,
+    and only when the request arrived through one; otherwise the header is ignored."""
+    ip = request.client.host if request.client else "unknown"
+    forwarded = request.headers.get("x-forwarded-for")
+    if not forwarded or not trusted_proxies or not is_trusted_proxy(ip):
+        return ip
+    hops = [hop.strip() for hop in forwarded.split(",") if hop.strip()]
+    if trusted_proxies == "*":
+        return hops[-1] if hops else ip
+    for hop in reversed(hops):
+        if not is_trusted_proxy(hop):
+            return hop
+    return hops[0] if hops else ip
+
+def rate_limit_keys(ip: str, requester: Optional[str] = None) -> List[str]:
+    keys = [f"ip:{ip}"]
+    if requester and requester.strip():
+        keys.append(f"requester:{requester.strip().lower()}")
+    return keys
+
+# --- NOTIFICATIONS ---
+# SMTP/WhatsApp settings and the dispatcher live in api/_notify.py, which legacy/app.py
+# imports too. On Vercel (NOTIFY_INLINE) nothing is sent from background threads: each
+# booking flushes its notifications from a BackgroundTask on its redirect, still within
+# the invocation. Elsewhere, delivery needs a long-lived process for the worker threads.
+try:
+    from _notify import WHATSAPP_RECIPIENTS, WHATSAPP_WEBHOOK_URL, notifier, notify_admins
+except ImportError:  # imported as api.index
+    from api._notify import WHATSAPP_RECIPIENTS, WHATSAPP_WEBHOOK_URL, notifier, notify_admins
+
+mark_import("notifications")
+
+def build_draft(cat_config, booking):
+    prefix = f"[{booking.get('Type', '')}] " if booking.get('Type') else ""
+    if cat_config["draft_type"] == "whatsapp":
+        return f"Hey everyone! ⚽ I've reserved {booking['Venue']} for a game on {booking['Date']} ({booking['Time_Slot']}). Join in!"
+    return f"Subject: Venue Reservation Request - {prefix}{booking['Venue']}\n\nDear Admin Team,\n\nI would like to request a reservation for {booking['Venue']} on {booking['Date']} for the slot {booking['Time_Slot']}.\n\nRequested By: {booking['Requested_By']}\n\nBest regards,\n{booking['Requested_By']}"
+
+def notify_booking(category: str, booking: dict):
+    cat_config = catalog.categories[category]
+    draft = build_draft(cat_config, booking)
+    if cat_config["draft_type"] == "email":
+        notify_admins(draft)
+    elif cat_config["draft_type"] == "whatsapp" and WHATSAPP_WEBHOOK_URL:
+        for recipient in WHATSAPP_RECIPIENTS:
+            notifier.submit("whatsapp", recipient, "", draft)
+
+# --- LIVE FEED ---
+SSE_KEEPALIVE = float(os.environ.get("SSE_KEEPALIVE", "15"))
+SSE_HISTORY = int(os.environ.get("SSE_HISTORY", "200"))
+SSE_QUEUE_SIZE = int(os.environ.get("SSE_QUEUE_SIZE", "100"))
+LANDING_AUDIENCE = "*"
+
+def booking_key(booking) -> str:
+    raw = f"{booking['Venue']}|{booking['Date']}|{booking['Time_Slot']}"
+    return hashlib.sha1(raw.encode()).hexdigest()[:12]
+
+class ChangeFeed:
+    """In-process fan-out of booking changes to SSE subscribers.
+
+    A change is published once, already rendered as `(event, data)` messages per
+    audience (a category's dashboard, or the landing page). Recent changes are kept
+    so a reconnecting client can resume from its Last-Event-ID. A subscriber that
+    falls too far behind is disconnected and catches up from that history.
+    """
+
+    def __init__(self, history: int, queue_size: int):
+        self.lock = threading.Lock()
+        self.last_id = 0
+        self.history = deque(maxlen=history)
+        self.queue_size = queue_size
+        self.subscribers = []
+
+    def publish(self, messages_by_audience: dict):
+        with self.lock:
+            self.last_id += 1
+            change = (self.last_id, messages_by_audience)
+            self.history.append(change)
+            subscribers = list(self.subscribers)
+        for loop, q, audience in subscribers:
+            if audience in messages_by_audience:
+                loop.call_soon_threadsafe(self._offer, q, change)
+
+    @staticmethod
+    def _offer(q: asyncio.Queue, change):
+        try:
+            q.put_nowait(change)
+        except asyncio.QueueFull:
+            while not q.empty():
+                q.get_nowait()
+            q.put_nowait(None)
+
+    def subscribe(self, audience: str, last_event_id: Optional[int] = None):
+        q: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        with self.lock:
+            if last_event_id is not None:
+                for change in self.history:
+                    if change[0] > last_event_id and audience in change[1] and not q.full():
+                        q.put_nowait(change)
+            self.subscribers.append((asyncio.get_running_loop(), q, audience))
+        return q
+
+    def unsubscribe(self, q: asyncio.Queue):
+        with self.lock:
+            self.subscribers = [sub for sub in self.subscribers if sub[1] is not q]
+
+change_feed = ChangeFeed(SSE_HISTORY, SSE_QUEUE_SIZE)
+
+mark_import("live_feed")
+
+def publish_change(kind: str, category: str, booking: dict):
+    """Renders the htmx deltas for one added/removed booking and pushes them to the feed."""
+    if not change_feed.subscribers:
+        return
+    booking = dict(booking, Key=booking_key(booking))
+    cat_config = catalog.categories.get(category)
+    messages = {}
+    if cat_config:
+        if kind == "added":
+            row = templates.get_template("partials/booking_row.html").render(
+                item=booking, index=0, category=category, config=cat_config)
+            messages[category] = [("booking-added", row)]
+        else:
+            messages[category] = [(f"booking-removed-{booking['Key']}", booking["Key"])]
+
+    today = dt_date.today()
+    try:
+        booking_date = datetime.strptime(str(booking["Date"]), "%Y-%m-%d").date()
+    except ValueError:
+        booking_date = None
+    if booking_date and (booking_date.year, booking_date.month) == (today.year, today.month):
+        day = booking_date.day
+        df = load_bookings(start=booking["Date"], end=booking["Date"])
+        day_bookings = df[df["Date"] == booking["Date"]].fillna("").to_dict("records") if not df.empty else []
+        if cat_config:
+            booked = any(b["Category"] == category for b in day_bookings)
+            cell = templates.get_template("partials/calendar_day.html").render(
+                day=day, today=today.day, booked_days=[day] if booked else [], config=cat_config)
+            messages[category].append((f"day-{day}", cell))
+        landing_cell = templates.get_template("partials/landing_day.html").render(
+            day=day, day_idx=booking_date.weekday(), today=today.day, year=today.year, month=today.month,
+            month_name=calendar.month_name[today.month], holidays=GOVT_HOLIDAYS,
+            weekday_closures=catalog.current()["weekday_closures"],
+            bookings_by_day={day: day_bookings} if day_bookings else {})
+        messages[LANDING_AUDIENCE] = [(f"day-{day}", landing_cell)]
+
+    if messages:
+        change_feed.publish(messages)
+
+def format_sse(event_id: int, event: str, data: str) -> str:
+    lines = [f"id: {event_id}", f"event: {event}"]
+    lines += [f"data: {line}" for line in data.splitlines() or [""]]
+    return "\n".join(lines) + "\n\n"
+
+async def stream_changes(request: Request, audience: str):
+    last_event_id = request.headers.get("last-event-id")
+    q = change_feed.subscribe(audience, int(last_event_id) if last_event_id and last_event_id.isdigit() else None)
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            try:
+                change = await asyncio.wait_for(q.get(), SSE_KEEPALIVE)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                yield ": keepalive\n\n"
+                continue
+            if change is None:
+                break
+            event_id, messages = change
+            for event, data in messages.get(audience, []):
+                yield format_sse(event_id, event, data)
+    finally:
+        change_feed.unsubscribe(q)
+
+# --- CROSS-WORKER COHERENCE ---
+class SharedVersion:
+    """Write-version counter shared by every worker process on the host.
+
+    The counter is 8 bytes in a memory-mapped file next to the bookings file, so
+    reading it is a plain memory load. Writers take `write_lock()` (a thread lock
+    plus an exclusive flock across processes), rewrite the data, then `bump()`.
+    Readers compare the counter against the version their cache was built from.
+    """
+
+    def __init__(self, path: str, lock_path: str):
+        self.path = path
+        self.lock_path = lock_path
+        self.mm = None
+        self.lock_fd = None
+        self.thread_lock = threading.RLock()
+        self.depth = 0
+        self.init_lock = threading.Lock()
+
+    def _ensure(self):
+        if self.mm is not None:
+            return
+        with self.init_lock:
+            if self.mm is not None:
+                return
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                if os.fstat(fd).st_size < 8:
+                    os.ftruncate(fd, 8)
+                mm = mmap.mmap(fd, 8)
+            finally:
+                os.close(fd)
+            self.lock_fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+            self.mm = mm
+
+    def get(self) -> int:
+        self._ensure()
+        return struct.unpack_from("<Q", self.mm, 0)[0]
+
+    def bump(self) -> int:
+        """Increments the counter. Callers must hold `write_lock()`."""
+        self._ensure()
+        version = struct.unpack_from("<Q", self.mm, 0)[0] + 1
+        struct.pack_into("<Q", self.mm, 0, version)
+        return version
+
+    @contextmanager
+    def write_lock(self):
+        self._ensure()
+        with self.thread_lock:
+            self.depth += 1
+            try:
+                if self.depth == 1 and fcntl:
+                    fcntl.flock(self.lock_fd, fcntl.LOCK_EX)
+                yield
+            finally:
+                if self.depth == 1 and fcntl:
+                    fcntl.flock(self.lock_fd, fcntl.LOCK_UN)
+                self.depth -= 1
+
+shared_version = SharedVersion(BOOKINGS_FILE + ".version", BOOKINGS_FILE + ".lock")
 
 # --- DATA LAYER ---
+BOOKING_COLUMNS = ["Category", "Type", "Venue", "Date", "Time_Slot", "Requested_By"]
+# Bookings are stored one CSV per month (PARTITION_DIR/YYYY-MM.csv). Months older than
+# ARCHIVE_AFTER_MONTHS are compacted into read-only per-year files (PARTITION_DIR/archive/YYYY.csv).
+# Ranged reads only open the files whose month or year overlaps the range.
+PARTITION_DIR = os.path.splitext(BOOKINGS_FILE)[0]
+ARCHIVE_DIR = os.path.join(PARTITION_DIR, "archive")
+UNDATED_PARTITION = "undated"
+# Ranged reads skip the archive from the cutoff on, so only lower this once archives exist.
+ARCHIVE_AFTER_MONTHS = int(os.environ.get("ARCHIVE_AFTER_MONTHS", "2"))
+# How many months back the dashboard history reaches before `?all=1` is needed.
+HISTORY_MONTHS_BACK = int(os.environ.get("HISTORY_MONTHS_BACK", "1"))
+# Bookings are accepted from the oldest month that is not archived through this many months
+# ahead. Supabase keeps partitions for the current month plus twelve, refreshed by the
+# monthly archive run, so the default stays one month inside that.
+BOOKING_MONTHS_AHEAD = int(os.environ.get("BOOKING_MONTHS_AHEAD", "11"))
+# Supabase reads go through a view that unions the partitioned table with its archive.
+SUPABASE_READ_TABLE = "bookings_all"
+
+# Parsed partition files, keyed by path and validated against (inode, mtime, size), so a
+# write from any worker (always an atomic replace) invalidates only the file it touched.
+_partition_cache = {}
+_storage_ready = False
+
+def empty_bookings():
+    return pd.DataFrame(columns=BOOKING_COLUMNS)
+
+def parse_date(value) -> Optional[dt_date]:
+    try:
+        return datetime.strptime(str(value)[:10], "%Y-%m-%d").date()
+    except ValueError:
+        return None
+
+def month_start(d: dt_date, months_back: int = 0) -> dt_date:
+    index = d.year * 12 + d.month - 1 - months_back
+    return dt_date(index // 12, index % 12 + 1, 1)
+
+def booking_window(today: Optional[dt_date] = None):
+    """First and last bookable dates: archived months are closed, far-future months have no partition yet."""
+    today = today or dt_date.today()
+    return month_start(today, ARCHIVE_AFTER_MONTHS), month_start(today, -(BOOKING_MONTHS_AHEAD + 1)) - timedelta(days=1)
+
+def booking_window_error(date: str) -> Optional[str]:
+    d = parse_date(date)
+    if d is None:
+        return f"Invalid date: {date}"
+    first, last = booking_window()
+    if d < first:
+        return f"{d:%B %Y} is archived and can no longer be booked"
+    if d > last:
+        return f"Bookings open at most until {last:%d %B %Y}"
+    return None
+
+def partition_path(date_value) -> str:
+    d = parse_date(date_value)
+    name = f"{d.year:04d}-{d.month:02d}" if d else UNDATED_PARTITION
+    return os.path.join(PARTITION_DIR, f"{name}.csv")
+
+def partition_files(start: Optional[str] = None, end: Optional[str] = None) -> List[str]:
+    """Lists the month and archive files that can hold bookings dated within [start, end]."""
+    start_d = parse_date(start) if start else dt_date.min
+    end_d = parse_date(end) if end else dt_date.max
+    ranged = start is not None or end is not None
+    if start_d is None or end_d is None:
+        start_d, end_d, ranged = dt_date.min, dt_date.max, False
+
+    # Archives only hold months before the cutoff, so ranges from the cutoff on never open them.
+    archived_until = month_start(dt_date.today(), ARCHIVE_AFTER_MONTHS) - timedelta(days=1)
+    files = []
+    for directory, is_archive in ((ARCHIVE_DIR, True), (PARTITION_DIR, False)):
+        if not os.path.isdir(directory):
+            continue
+        for fname in sorted(os.listdir(directory)):
+            if not fname.endswith(".csv"):
+                continue
+            name = fname[:-4]
+            if name == UNDATED_PARTITION:
+                if not ranged:
+                    files.append(os.path.join(directory, fname))
+                continue
+            try:
+                if is_archive:
+                    first, last = dt_date(int(name), 1, 1), min(dt_date(int(name), 12, 31), archived_until)
+                else:
+                    first = datetime.strptime(name, "%Y-%m").date()
+                    last = month_start(first, -1) - timedelta(days=1)
+            except ValueError:
+                continue
+            if first <= end_d and last >= start_d:
+                files.append(os.path.join(directory, fname))
+    return files
+
+def partition_cache_key(path: str):
+    """(inode, mtime, size) of a partition file, or None if it does not exist."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+def read_partition(path: str):
+    key = partition_cache_key(path)
+    if key is None:
+        _partition_cache.pop(path, None)
+        return empty_bookings()
+    cached = _partition_cache.get(path)
+    if cached is None or cached[0] != key:
+        df = pd.read_csv(path) if key[2] > 0 else empty_bookings()
+        cached = _partition_cache[path] = (key, df)
+    return cached[1].copy()
+
+def write_partition(path: str, df):
+    """Atomically replaces one partition file and bumps the shared version. Callers hold the write lock."""
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    if df.empty:
+        if os.path.exists(path):
+            os.remove(path)
+    else:
+        df.to_csv(tmp_path, index=False, columns=[c for c in BOOKING_COLUMNS if c in df.columns])
+        if path.startswith(ARCHIVE_DIR):
+            os.chmod(tmp_path, 0o444)
+        os.replace(tmp_path, path)
+    shared_version.bump()
+
 def init_db():
-    if not os.path.exists(BOOKINGS_FILE):
-        try:
-            df = pd.DataFrame(columns=["Category", "Type", "Venue", "Date", "Time_Slot", "Requested_By"])
-            df.to_csv(BOOKINGS_FILE, index=False)
-        except Exception as e:
-            print(f"Init error: {e}")
+    global _storage_ready
+    # Supabase mode keeps nothing on local disk.
+    if _storage_ready or supabase:
+        return
+    try:
+        os.makedirs(PARTITION_DIR, exist_ok=True)
+        # One-time split of a single-file store written by earlier versions of this app.
+        # Legacy Gradio files (no Time_Slot column) are left for scripts/migrate_legacy.py.
+        if os.path.exists(BOOKINGS_FILE) and os.path.getsize(BOOKINGS_FILE) > 0 \
+                and "Time_Slot" in pd.read_csv(BOOKINGS_FILE, nrows=0).columns:
+            with shared_version.write_lock():
+                if os.path.exists(BOOKINGS_FILE):
+                    df = pd.read_csv(BOOKINGS_FILE)
+                    for path, part in df.groupby(df["Date"].map(partition_path)):
+                        write_partition(path, pd.concat([read_partition(path), part], ignore_index=True))
+                    os.replace(BOOKINGS_FILE, BOOKINGS_FILE + ".pre-partition")
+        _storage_ready = True
+    except Exception as e:
+        print(f"Init error: {e}")
 
-def load_bookings(category: Optional[str] = None):
+def _load_partitions(start: Optional[str] = None, end: Optional[str] = None):
+    """Reads the CSV partitions overlapping the range into one frame, tagging rows with their file."""
+    frames = []
+    for path in partition_files(start, end):
+        df = read_partition(path)
+        if not df.empty:
+            frames.append(df.assign(_path=path))
+    df = pd.concat(frames, ignore_index=True) if frames else empty_bookings().assign(_path=None)
+    if start:
+        df = df[df["Date"].astype(str) >= start]
+    if end:
+        df = df[df["Date"].astype(str) <= end]
+    return df
+
+def load_bookings(category: Optional[str] = None, start: Optional[str] = None, end: Optional[str] = None):
+    """Loads bookings, optionally limited to a category and an inclusive YYYY-MM-DD date range."""
     init_db()
     try:
         if supabase:
-            query = supabase.table("bookings").select("*")
+            query = supabase.table(SUPABASE_READ_TABLE).select("*")
             if category:
                 query = query.eq("Category", category)
+            if start:
+                query = query.gte("Date", start)
+            if end:
+                query = query.lte("Date", end)
             response = query.execute()
             df = pd.DataFrame(response.data)
         else:
-            if os.path.exists(BOOKINGS_FILE) and os.path.getsize(BOOKINGS_FILE) > 0:
-                df = pd.read_csv(BOOKINGS_FILE)
-                if category:
-                    df = df[df["Category"] == category]
-            else:
-                df = pd.DataFrame(columns=["Category", "Type", "Venue", "Date", "Time_Slot", "Requested_By"])
+            df = _load_partitions(start, end).drop(columns="_path")
+            if category:
+                df = df[df["Category"] == category]
         
         if "Type" not in df.columns:
             df["Type"] = ""
@@ -128,24 +876,397 @@ def load_bookings(category: Optional[str] = None):
         return df.sort_values(by="Date", ascending=False)
     except Exception as e:
         print(f"Load error: {e}")
-        return pd.DataFrame(columns=["Category", "Type", "Venue", "Date", "Time_Slot", "Requested_By"])
+        return empty_bookings()
+
+class SlotConflictError(Exception):
+    """Raised when the store rejects a booking because the venue/date/slot is taken."""
+
+# Postgres unique_violation, raised by the bookings_venue_date_slot_key constraint.
+UNIQUE_VIOLATION = "23505"
 
 def save_booking_data(category, type_val, venue, date, time_slot, requested_by):
     if supabase:
         data = {"Category": category, "Type": type_val, "Venue": venue, "Date": date, "Time_Slot": time_slot, "Requested_By": requested_by}
-        supabase.table("bookings").insert(data).execute()
+        try:
+            supabase.table("bookings").insert(data, returning="minimal").execute()
+        except Exception as e:
+            if getattr(e, "code", None) == UNIQUE_VIOLATION:
+                raise SlotConflictError(venue) from e
+            raise
     else:
-        df = load_bookings()
-        new_row = {"Category": category, "Type": type_val, "Venue": venue, "Date": date, "Time_Slot": time_slot, "Requested_By": requested_by}
-        df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
-        df.to_csv(BOOKINGS_FILE, index=False)
+        init_db()
+        with shared_version.write_lock():
+            path = partition_path(date)
+            new_row = {"Category": category, "Type": type_val, "Venue": venue, "Date": date, "Time_Slot": time_slot, "Requested_By": requested_by}
+            write_partition(path, pd.concat([read_partition(path), pd.DataFrame([new_row])], ignore_index=True))
+
+def archive_past_months(today: Optional[dt_date] = None) -> int:
+    """Compacts month partitions older than ARCHIVE_AFTER_MONTHS into per-year archive files.
+
+    Returns the number of month partitions archived.
+    """
+    init_db()
+    cutoff = month_start(today or dt_date.today(), ARCHIVE_AFTER_MONTHS)
+    archived = 0
+    with shared_version.write_lock():
+        by_year = {}
+        for fname in sorted(os.listdir(PARTITION_DIR)):
+            try:
+                month = datetime.strptime(fname[:-4], "%Y-%m").date()
+            except ValueError:
+                continue
+            if fname.endswith(".csv") and month < cutoff:
+                by_year.setdefault(month.year, []).append(os.path.join(PARTITION_DIR, fname))
+        if by_year:
+            os.makedirs(ARCHIVE_DIR, exist_ok=True)
+        for year, paths in by_year.items():
+            archive_path = os.path.join(ARCHIVE_DIR, f"{year:04d}.csv")
+            merged = pd.concat([read_partition(archive_path)] + [read_partition(p) for p in paths], ignore_index=True)
+            write_partition(archive_path, merged.sort_values(by="Date"))
+            for path in paths:
+                os.remove(path)
+                _partition_cache.pop(path, None)
+            archived += len(paths)
+    return archived
+
+# --- SEARCH INDEX ---
+SEARCH_MAX_PREFIX = 16
+SEARCH_RESULT_LIMIT = int(os.environ.get("SEARCH_RESULT_LIMIT", "50"))
+# Supabase writes can come from other instances, so the index is also rebuilt after this many seconds there.
+SEARCH_INDEX_TTL = float(os.environ.get("SEARCH_INDEX_TTL", "60"))
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+def search_tokens(text) -> List[str]:
+    return TOKEN_RE.findall(str(text).lower()) if text is not None and text == text else []
+
+class PartitionIndex:
+    """Prefix postings for the bookings of one partition file (or, on Supabase, all of them).
+
+    Every token prefix (up to SEARCH_MAX_PREFIX chars) maps to the set of booking keys
+    containing it, per category. `cache_key` is the file's `partition_cache_key` when it
+    was read; None means it has to be read again.
+    """
+
+    def __init__(self, cache_key, records=()):
+        self.cache_key = cache_key
+        self.records = {}
+        self.postings = {}
+        for record in records:
+            self.add(record)
+
+    def add(self, record):
+        record = dict(record, Key=booking_key(record))
+        self.records[record["Key"]] = record
+        category = record.get("Category")
+        for token in set(search_tokens(record.get("Requested_By")) + search_tokens(record.get("Venue"))):
+            for n in range(1, min(len(token), SEARCH_MAX_PREFIX) + 1):
+                self.postings.setdefault((category, token[:n]), set()).add(record["Key"])
+
+    def remove(self, record):
+        key = booking_key(record)
+        record = self.records.pop(key, None)
+        if record is None:
+            return
+        category = record.get("Category")
+        for token in set(search_tokens(record.get("Requested_By")) + search_tokens(record.get("Venue"))):
+            for n in range(1, min(len(token), SEARCH_MAX_PREFIX) + 1):
+                keys = self.postings.get((category, token[:n]))
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self.postings[(category, token[:n])]
+
+    def apply(self, kind: str, record):
+        if kind == "added":
+            self.add(record)
+        else:
+            self.remove(record)
+
+    def match(self, category: str, tokens: List[str]):
+        postings = sorted((self.postings.get((category, t[:SEARCH_MAX_PREFIX]), set()) for t in tokens), key=len)
+        return [self.records[k] for k in set(postings[0]).intersection(*postings[1:])]
+
+class BookingIndex:
+    """In-memory prefix index over requester and venue names, kept per partition file.
+
+    Writes made by this process update their partition in place. After anything else
+    (another worker's write, or the Supabase TTL) the next query re-reads only the
+    partition files whose cache key changed. That refresh is built without holding
+    `lock` and swapped in, so `apply()`, which runs under the cross-worker write lock,
+    never waits behind a file read. Writes applied during a refresh are replayed on the
+    swapped-in partitions.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.refresh_lock = threading.Lock()
+        self.parts = {}
+        self.version = None
+        self.built_at = None
+        # Writes applied while a refresh is being built, replayed when it is swapped in.
+        self.pending = None
+
+    def _fresh(self) -> bool:
+        if self.built_at is None:
+            return False
+        if supabase:
+            return time.monotonic() - self.built_at < SEARCH_INDEX_TTL
+        return self.version == shared_version.get()
+
+    @staticmethod
+    def _records(df):
+        return df.fillna("").to_dict("records")
+
+    def _refresh(self):
+        with self.lock:
+            parts = self.parts
+            self.pending = []
+        if supabase:
+            version = None
+            fresh = {None: PartitionIndex(None, self._records(load_bookings()))}
+        else:
+            init_db()
+            version = shared_version.get()
+            fresh = {}
+            for path in partition_files():
+                # Take the key before reading, so a write in between forces another read later.
+                key = partition_cache_key(path)
+                part = parts.get(path)
+                if part is None or part.cache_key is None or part.cache_key != key:
+                    part = PartitionIndex(key, self._records(read_partition(path)))
+                fresh[path] = part
+        with self.lock:
+            for kind, path, record in self.pending:
+                part = fresh.setdefault(path, PartitionIndex(None))
+                part.apply(kind, record)
+                part.cache_key = None
+            self.pending = None
+            self.parts = fresh
+            self.version = version
+            self.built_at = time.monotonic()
+
+    def apply(self, kind: str, record: dict, previous_version: Optional[int] = None):
+        """Applies this process's own write. For CSV, call with the write lock held and
+        the version read just before the write, so a missed foreign write is detected."""
+        path = None if supabase else partition_path(record.get("Date"))
+        with self.lock:
+            if self.built_at is None and self.pending is None:
+                return
+            if self.pending is not None:
+                self.pending.append((kind, path, record))
+            part = self.parts.get(path)
+            if part is None:
+                part = self.parts[path] = PartitionIndex(None)
+            part.apply(kind, record)
+            if supabase:
+                return
+            if self.version == previous_version:
+                part.cache_key = partition_cache_key(path)
+                self.version = shared_version.get()
+            else:
+                part.cache_key = None
+
+    def search(self, category: str, query: str, limit: int = SEARCH_RESULT_LIMIT):
+        """Blocks on a refresh when the index is stale; call it from the threadpool."""
+        tokens = search_tokens(query)
+        if not tokens:
+            return []
+        if not self._fresh():
+            with self.refresh_lock:
+                if not self._fresh():
+                    self._refresh()
+        with self.lock:
+            records = [r for part in self.parts.values() for r in part.match(category, tokens)]
+
+        # Tokens longer than the indexed prefix length still need an exact prefix check.
+        long_tokens = [t for t in tokens if len(t) > SEARCH_MAX_PREFIX]
+        if long_tokens:
+            records = [r for r in records
+                       if all(any(w.startswith(t) for w in search_tokens(r.get("Requested_By")) + search_tokens(r.get("Venue")))
+                              for t in long_tokens)]
+        records.sort(key=lambda r: str(r.get("Date", "")), reverse=True)
+        return records[:limit]
+
+booking_index = BookingIndex()
+
+mark_import("data_and_search")
+
+# --- ICAL FEEDS ---
+# Campus time is IST (UTC+05:30, no DST), so events are emitted in UTC.
+CAMPUS_UTC_OFFSET = timedelta(hours=5, minutes=30)
+# Supabase has no shared write counter; feeds there are rebuilt at most this often.
+ICAL_CACHE_TTL = float(os.environ.get("ICAL_CACHE_TTL", "300"))
+ICAL_VEVENT_CACHE_SIZE = 10000
+ICAL_FEED_CACHE_SIZE = 256
+# DTSTAMP is the booking's created_at on Supabase. CSV rows carry no creation time, so there
+# it is the last write to the booking's month partition. Either way it only changes with the
+# data, so an unchanged feed keeps its ETag.
+
+# Rendered VEVENT blocks by booking contents, so a rebuild only formats new or changed bookings.
+_vevent_cache = {}
+# Feed id -> {"version", "etag", "last_modified", "body"}, least recently used first.
+_ical_feeds: "OrderedDict[str, dict]" = OrderedDict()
+_ical_feeds_lock = threading.Lock()
+
+def data_version():
+    return int(time.time() // ICAL_CACHE_TTL) if supabase else shared_version.get()
+
+def ical_escape(text) -> str:
+    text = "" if text is None or text != text else str(text)
+    return text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+
+def ical_fold(line: str) -> str:
+    """Folds a content line to 75 octets as RFC 5545 requires."""
+    raw = line.encode()
+    if len(raw) <= 75:
+        return line
+    parts, chunk = [], 75
+    while raw:
+        cut = min(chunk, len(raw))
+        while cut < len(raw) and (raw[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(raw[:cut].decode())
+        raw = raw[cut:]
+        chunk = 74
+    return "\r\n ".join(parts)
+
+def slot_times(date_value, time_slot):
+    """Returns the (start, end) of a booking as UTC datetimes, or None if it cannot be parsed."""
+    day = parse_date(date_value)
+    try:
+        start_s, end_s = [part.strip() for part in str(time_slot).split("-", 1)]
+        start_t = datetime.strptime(start_s, "%I:%M %p").time()
+        end_t = datetime.strptime(end_s, "%I:%M %p").time()
+    except ValueError:
+        return None
+    if day is None:
+        return None
+    start = datetime.combine(day, start_t)
+    end = datetime.combine(day, end_t)
+    if end <= start:
+        end += timedelta(days=1)
+    return ((start - CAMPUS_UTC_OFFSET).replace(tzinfo=timezone.utc),
+            (end - CAMPUS_UTC_OFFSET).replace(tzinfo=timezone.utc))
+
+def ical_dtstamp(booking, partition_stamps: dict) -> str:
+    created_at = booking.get("created_at")
+    if created_at and created_at == created_at:
+        try:
+            stamp = datetime.fromisoformat(str(created_at))
+            return f"{stamp.astimezone(timezone.utc):%Y%m%dT%H%M%SZ}"
+        except ValueError:
+            pass
+    path = partition_path(booking.get("Date"))
+    if path not in partition_stamps:
+        day = parse_date(booking.get("Date"))
+        archive_path = os.path.join(ARCHIVE_DIR, f"{day.year:04d}.csv") if day else path
+        key = partition_cache_key(path) or partition_cache_key(archive_path)
+        modified = datetime.fromtimestamp(key[1] / 1e9, timezone.utc) if key else datetime.now(timezone.utc)
+        partition_stamps[path] = f"{modified:%Y%m%dT%H%M%SZ}"
+    return partition_stamps[path]
+
+def booking_vevent(booking, dtstamp: str) -> Optional[str]:
+    fields = tuple(str(booking.get(c, "")) for c in BOOKING_COLUMNS) + (str(booking.get("created_at", "")), dtstamp)
+    cached = _vevent_cache.get(fields)
+    if cached is not None:
+        return cached
+    times = slot_times(booking.get("Date"), booking.get("Time_Slot"))
+    if times is None:
+        return None
+    start, end = times
+    # The slot alone is not unique over time: a slot deleted and rebooked by someone else must
+    # be a new event, or clients keep showing the old requester.
+    uid = hashlib.sha1("|".join(fields[:-1]).encode()).hexdigest()
+    summary = f"{booking['Venue']} - {booking['Requested_By']}"
+    if booking.get("Type") and booking["Type"] == booking["Type"]:
+        summary = f"[{booking['Type']}] {summary}"
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:{uid}@venue-booking.spjimr",
+        f"DTSTAMP:{dtstamp}",
+        f"DTSTART:{start:%Y%m%dT%H%M%SZ}",
+        f"DTEND:{end:%Y%m%dT%H%M%SZ}",
+        f"SUMMARY:{ical_escape(summary)}",
+        f"LOCATION:{ical_escape(booking['Venue'])}",
+        f"DESCRIPTION:{ical_escape(catalog.categories.get(booking.get('Category'), {}).get('title', booking.get('Category')))} booking by {ical_escape(booking['Requested_By'])}",
+        f"CATEGORIES:{ical_escape(booking.get('Category'))}",
+        "END:VEVENT",
+    ]
+    vevent = "\r\n".join(ical_fold(line) for line in lines)
+    if len(_vevent_cache) >= ICAL_VEVENT_CACHE_SIZE:
+        _vevent_cache.clear()
+    _vevent_cache[fields] = vevent
+    return vevent
+
+def build_ical(name: str, bookings) -> str:
+    partition_stamps = {}
+    events = [booking_vevent(b, ical_dtstamp(b, partition_stamps)) for b in bookings]
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//SPJIMR//Venue Booking//EN",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        ical_fold(f"X-WR-CALNAME:{ical_escape(name)}"),
+    ]
+    lines += [e for e in events if e]
+    lines.append("END:VCALENDAR")
+    return "\r\n".join(lines) + "\r\n"
+
+def ical_feed(feed_id: str, name: str, loader):
+    """Returns the cached feed, rebuilding it only when the data version or the feed window
+    (which starts at ical_range_start) has moved on. `loader(start)` loads bookings from `start`."""
+    start = ical_range_start()
+    version = (data_version(), start)
+    with _ical_feeds_lock:
+        entry = _ical_feeds.get(feed_id)
+        if entry is not None:
+            _ical_feeds.move_to_end(feed_id)
+    if entry is None or entry["version"] != version:
+        df = loader(start)
+        records = df.sort_values(by=["Date", "Time_Slot"]).to_dict("records") if not df.empty else []
+        body = build_ical(name, records)
+        etag = '"' + hashlib.sha1(body.encode()).hexdigest() + '"'
+        if entry is not None and entry["etag"] == etag:
+            last_modified = entry["last_modified"]
+        else:
+            last_modified = datetime.now(timezone.utc).replace(microsecond=0)
+        entry = {"version": version, "etag": etag, "last_modified": last_modified, "body": body}
+        with _ical_feeds_lock:
+            _ical_feeds[feed_id] = entry
+            while len(_ical_feeds) > ICAL_FEED_CACHE_SIZE:
+                _ical_feeds.popitem(last=False)
+    return entry
+
+def ical_response(request: Request, entry) -> Response:
+    headers = {
+        "ETag": entry["etag"],
+        "Last-Modified": format_datetime(entry["last_modified"], usegmt=True),
+        "Cache-Control": "public, max-age=0, must-revalidate",
+    }
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if entry["etag"] in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+            return Response(status_code=304, headers=headers)
+    elif request.headers.get("if-modified-since"):
+        try:
+            if entry["last_modified"] <= parsedate_to_datetime(request.headers["if-modified-since"]):
+                return Response(status_code=304, headers=headers)
+        except (TypeError, ValueError):
+            pass
+    return Response(content=entry["body"], media_type="text/calendar; charset=utf-8", headers=headers)
+
+def ical_range_start() -> str:
+    return month_start(dt_date.today(), HISTORY_MONTHS_BACK).isoformat()
+
+mark_import("ical_feeds")
 
 # --- ROUTES ---
 @app.get("/", response_class=HTMLResponse)
 async def landing(request: Request):
     try:
-        df = load_bookings()
         today = dt_date.today()
+        df = load_bookings(start=month_start(today).isoformat(), end=(month_start(today, -1) - timedelta(days=1)).isoformat())
         cal = calendar.monthcalendar(today.year, today.month)
         
         bookings_by_day = {}
@@ -175,22 +1296,42 @@ async def landing(request: Request):
             "year": today.year,
             "today": today.day,
             "bookings_by_day": bookings_by_day,
-            "holidays": GOVT_HOLIDAYS
+            "holidays": GOVT_HOLIDAYS,
+            "weekday_closures": catalog.current()["weekday_closures"]
         })
     except Exception as e:
         import traceback
         return HTMLResponse(content=f"Error in landing route: {str(e)}<pre>{traceback.format_exc()}</pre>", status_code=500)
 
+def load_history(category: str, show_all: bool = False):
+    # Only the hot partitions by default; `?all=1` opens the archive as well.
+    history_start = None if show_all else month_start(dt_date.today(), HISTORY_MONTHS_BACK).isoformat()
+    return load_bookings(category, start=history_start)
+
+def history_rows(df) -> List[dict]:
+    rows = df.to_dict('records')
+    for item in rows:
+        item["Key"] = booking_key(item)
+    return rows
+
 @app.get("/dashboard/{category}", response_class=HTMLResponse)
 async def dashboard(request: Request, category: str):
-    if category not in CATEGORIES:
+    if category not in catalog.categories:
         return RedirectResponse(url="/")
     
-    cat_config = CATEGORIES[category]
-    df = load_bookings(category)
-    bookings_list = df.to_dict('records')
-    
+    cat_config = catalog.categories[category]
+    q = request.query_params.get("q", "").strip()
+    if not search_tokens(q):
+        q = ""
+    show_all = request.query_params.get("all") == "1"
     today = dt_date.today()
+    # Storage reads and index rebuilds block, so they run in the threadpool.
+    df = await run_in_threadpool(load_history, category, show_all)
+    if q:
+        bookings_list = await run_in_threadpool(booking_index.search, category, q)
+    else:
+        bookings_list = history_rows(df)
+    
     cal = calendar.monthcalendar(today.year, today.month)
     
     booked_days = []
@@ -200,14 +1341,7 @@ async def dashboard(request: Request, category: str):
             booked_days = df[df['Date_obj'].dt.month == today.month]['Date_obj'].dt.day.dropna().astype(int).unique().tolist()
         except: pass
 
-    draft = ""
-    if bookings_list:
-        latest = bookings_list[0]
-        prefix = f"[{latest.get('Type', '')}] " if latest.get('Type') else ""
-        if cat_config["draft_type"] == "whatsapp":
-            draft = f"Hey everyone! ⚽ I've reserved {latest['Venue']} for a game on {latest['Date']} ({latest['Time_Slot']}). Join in!"
-        else:
-            draft = f"Subject: Venue Reservation Request - {prefix}{latest['Venue']}\n\nDear Admin Team,\n\nI would like to request a reservation for {latest['Venue']} on {latest['Date']} for the slot {latest['Time_Slot']}.\n\nRequested By: {latest['Requested_By']}\n\nBest regards,\n{latest['Requested_By']}"
+    draft = build_draft(cat_config, bookings_list[0]) if bookings_list else ""
 
     return templates.TemplateResponse("dashboard.html", {
         "request": request,
@@ -215,18 +1349,35 @@ async def dashboard(request: Request, category: str):
         "config": cat_config,
         "venues": cat_config["venues"],
         "types": cat_config.get("types", []),
-        "time_slots": TIME_SLOTS,
+        "time_slots": catalog.time_slots,
         "bookings": bookings_list,
         "calendar": cal,
         "month_name": calendar.month_name[today.month],
         "year": today.year,
         "today": today.day,
         "booked_days": booked_days,
-        "draft": draft
+        "draft": draft,
+        "q": q,
+        "show_all": show_all
     })
 
+@app.get("/search/{category}", response_class=HTMLResponse)
+async def search(category: str, q: str = "", all: str = ""):
+    """Returns the history table body for the dashboard filter as an htmx fragment.
+    A cleared query gets the default history view back, not a search over everything."""
+    if category not in catalog.categories:
+        raise HTTPException(status_code=404, detail="Unknown category")
+    if search_tokens(q):
+        results = await run_in_threadpool(booking_index.search, category, q)
+    else:
+        q = ""
+        results = history_rows(await run_in_threadpool(load_history, category, all == "1"))
+    return HTMLResponse(templates.get_template("partials/history_body.html").render(
+        bookings=results, category=category, config=catalog.categories[category], q=q))
+
 @app.post("/book/{category}")
 async def book(
+    request: Request,
     category: str,
     booking_type: str = Form(None),
     venue: str = Form(...),
@@ -235,36 +1386,194 @@ async def book(
     time_slot: str = Form(...),
     requested_by: str = Form(...)
 ):
-    final_venue = manual_venue if venue == "Other (Manual Entry)" and manual_venue else venue
-    
-    if category == "sports":
-        booking_date = datetime.strptime(date, "%Y-%m-%d").date()
-        if booking_date.weekday() == 0:
-            if "Rec Centre" in final_venue or "Yoga Room" in final_venue:
-                error_msg = f"Rec Centre is closed on Mondays (Venue: {final_venue})"
-                return RedirectResponse(url=f"/dashboard/{category}?error={urllib.parse.quote(error_msg)}", status_code=303)
-
-    df = load_bookings()
-    if not df.empty:
-        conflict = df[(df['Venue'] == final_venue) & (df['Date'] == date) & (df['Time_Slot'] == time_slot)]
-        if not conflict.empty:
-            return RedirectResponse(url=f"/dashboard/{category}?error=Conflict: {final_venue} is already reserved.", status_code=303)
+    ip = client_ip(request)
+    rate_limiter.check(*rate_limit_keys(ip, requested_by))
+    # Fair queueing is per IP: the requester name is free text and costs nothing to change.
+    return await admission.run(ip, create_booking, category, booking_type, venue, manual_venue, date, time_slot, requested_by)
 
-    save_booking_data(category, booking_type, final_venue, date, time_slot, requested_by)
-    return RedirectResponse(url=f"/dashboard/{category}", status_code=303)
+def create_booking(category, booking_type, venue, manual_venue, date, time_slot, requested_by):
+    final_venue = manual_venue if venue == MANUAL_ENTRY and manual_venue else venue
+
+    error_msg = catalog.validate(category, venue, final_venue, date, time_slot)
+    if error_msg:
+        return RedirectResponse(url=f"/dashboard/{category}?error={urllib.parse.quote(error_msg)}", status_code=303)
+    error_msg = booking_window_error(date)
+    if error_msg:
+        return RedirectResponse(url=f"/dashboard/{category}?error={urllib.parse.quote(error_msg)}", status_code=303)
+
+    booking = {"Category": category, "Type": booking_type, "Venue": final_venue, "Date": date,
+               "Time_Slot": time_slot, "Requested_By": requested_by}
+    conflict_redirect = RedirectResponse(url=f"/dashboard/{category}?error=Conflict: {final_venue} is already reserved.", status_code=303)
+    if supabase:
+        # The unique constraint on (Venue, Date, Time_Slot) does the conflict check in the same round trip.
+        try:
+            save_booking_data(category, booking_type, final_venue, date, time_slot, requested_by)
+        except SlotConflictError:
+            return conflict_redirect
+        booking_index.apply("added", booking)
+    else:
+        # Hold the cross-worker write lock from the conflict check through the save.
+        with shared_version.write_lock():
+            df = load_bookings(start=date, end=date)
+            if not df.empty:
+                conflict = df[(df['Venue'] == final_venue) & (df['Date'] == date) & (df['Time_Slot'] == time_slot)]
+                if not conflict.empty:
+                    return conflict_redirect
+
+            previous_version = shared_version.get()
+            save_booking_data(category, booking_type, final_venue, date, time_slot, requested_by)
+            booking_index.apply("added", booking, previous_version)
+    if category in catalog.categories:
+        notify_booking(category, booking)
+    publish_change("added", category, booking)
+    # Inline mode: deliver after the redirect is sent, but before the invocation ends.
+    background = BackgroundTask(notifier.flush) if notifier.inline else None
+    return RedirectResponse(url=f"/dashboard/{category}", status_code=303, background=background)
 
 @app.post("/delete/{category}/{index}")
-async def delete(category: str, index: int):
-    df_all = load_bookings()
+async def delete(request: Request, category: str, index: int, booking_key: str = Form(None), booking_date: str = Form(None)):
+    ip = client_ip(request)
+    rate_limiter.check(*rate_limit_keys(ip))
+    return await admission.run(ip, delete_booking, category, index, booking_key, booking_date)
+
+def delete_booking(category: str, index: int, key: Optional[str] = None, date: Optional[str] = None):
+    # Supabase deletes are single statements; the host-local flock only guards the CSV store.
+    if supabase:
+        return _delete_booking(category, index, key, date)
+    with shared_version.write_lock():
+        return _delete_booking(category, index, key, date)
+
+def _delete_booking(category: str, index: int, key: Optional[str] = None, date: Optional[str] = None):
+    # With the row's date we only need to open its partition; otherwise search everything.
+    if supabase:
+        df_all = load_bookings(start=date, end=date)
+    else:
+        init_db()
+        df_all = _load_partitions(date, date).sort_values(by="Date", ascending=False)
     df_cat = df_all[df_all["Category"] == category]
-    
-    if 0 <= index < len(df_cat):
-        actual_index = df_cat.index[index]
-        df_all = df_all.drop(actual_index).reset_index(drop=True)
-        df_all.to_csv(BOOKINGS_FILE, index=False)
+
+    # Live-updated pages may have shifted row positions, so prefer the stable key when given.
+    if key:
+        matches = [i for i, row in df_cat.iterrows() if booking_key(row) == key]
+        actual_index = matches[0] if matches else None
+    else:
+        actual_index = df_cat.index[index] if 0 <= index < len(df_cat) else None
+
+    if actual_index is not None:
+        removed = df_all.loc[actual_index].to_dict()
+        # The archive is read-only: archived rows show up under `?all=1` but cannot be deleted.
+        archived_redirect = RedirectResponse(
+            url=f"/dashboard/{category}?error={urllib.parse.quote('Archived bookings are read-only.')}", status_code=303)
+        if supabase:
+            slot = {"Venue": removed["Venue"], "Date": removed["Date"], "Time_Slot": removed["Time_Slot"]}
+            response = supabase.table("bookings").delete().match(slot).execute()
+            if not response.data:
+                if supabase.table("bookings_archive").select("id").match(slot).limit(1).execute().data:
+                    return archived_redirect
+                # Already deleted by someone else; their delete published the change.
+                return RedirectResponse(url=f"/dashboard/{category}", status_code=303)
+            booking_index.apply("removed", removed)
+        else:
+            path = removed.pop("_path")
+            if os.path.dirname(path) == ARCHIVE_DIR:
+                return archived_redirect
+            part = read_partition(path)
+            part = part[part.apply(booking_key, axis=1) != booking_key(removed)] if not part.empty else part
+            previous_version = shared_version.get()
+            write_partition(path, part)
+            booking_index.apply("removed", removed, previous_version)
+        publish_change("removed", category, removed)
         
     return RedirectResponse(url=f"/dashboard/{category}", status_code=303)
 
+@app.get("/events")
+async def landing_events(request: Request):
+    return StreamingResponse(stream_changes(request, LANDING_AUDIENCE), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/events/{category}")
+async def category_events(request: Request, category: str):
+    if category not in catalog.categories:
+        raise HTTPException(status_code=404, detail="Unknown category")
+    return StreamingResponse(stream_changes(request, category), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/ical/venue/{venue:path}")
+async def ical_venue(request: Request, venue: str):
+    if venue not in catalog.current()["venue_category"]:
+        raise HTTPException(status_code=404, detail="Unknown venue")
+    def loader(start):
+        df = load_bookings(start=start)
+        return df[df["Venue"] == venue] if not df.empty else df
+    entry = await run_in_threadpool(ical_feed, f"venue:{venue}", f"SPJIMR - {venue}", loader)
+    return ical_response(request, entry)
+
+@app.get("/ical/{category}")
+async def ical_category(request: Request, category: str):
+    if category not in catalog.categories:
+        raise HTTPException(status_code=404, detail="Unknown category")
+    entry = await run_in_threadpool(ical_feed, f"category:{category}", f"SPJIMR {catalog.categories[category]['title']}",
+                                    lambda start: load_bookings(category, start=start))
+    return ical_response(request, entry)
+
+@app.get("/api/archive")
+def archive(request: Request):
+    """Compacts past months into the archive. Scheduled monthly through Vercel cron (see vercel.json);
+    elsewhere, call it from cron with the same bearer token. Disabled until CRON_SECRET is set."""
+    secret = os.environ.get("CRON_SECRET")
+    if not secret:
+        raise HTTPException(status_code=503, detail="Archiving is disabled: CRON_SECRET is not set")
+    if not hmac.compare_digest(request.headers.get("authorization", ""), f"Bearer {secret}"):
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    if supabase:
+        if not supabase_service:
+            raise HTTPException(status_code=503, detail="Archiving needs SUPABASE_SERVICE_KEY")
+        cutoff = month_start(dt_date.today(), ARCHIVE_AFTER_MONTHS).isoformat()
+        response = supabase_service.rpc("archive_bookings", {"cutoff": cutoff}).execute()
+        return {"status": "ok", "archived": response.data}
+    return {"status": "ok", "archived": archive_past_months()}
+
 @app.get("/api/health")
 def health():
-    return {"status": "ok", "vercel": os.environ.get("VERCEL", False)}
+    # The version file only exists for the CSV store; don't create it in Supabase mode.
+    return {"status": "ok", "vercel": os.environ.get("VERCEL", False),
+            "data_version": None if supabase else shared_version.get()}
+
+@app.get("/api/cold-start")
+def cold_start_report():
+    if not COLD_START_PROFILE:
+        raise HTTPException(status_code=404, detail="Set COLD_START_PROFILE=1 to enable")
+    return cold_start
+
+if COLD_START_PROFILE:
+    @app.middleware("http")
+    async def profile_first_request(request: Request, call_next):
+        if cold_start["first_request"] is not None:
+            return await call_next(request)
+        resources_before = set(cold_start["resources_ms"])
+        started = time.perf_counter()
+        response = await call_next(request)
+        cold_start["first_request"] = {
+            "path": request.url.path,
+            "total_ms": round((time.perf_counter() - started) * 1000, 2),
+            "since_import_start_ms": round((time.perf_counter() - _IMPORT_STARTED) * 1000, 2),
+            "resources_initialized": {k: v for k, v in cold_start["resources_ms"].items() if k not in resources_before},
+        }
+        print(f"Cold start: {json.dumps(cold_start)}")
+        return response
+
+def prewarm():
+    """Initializes the lazy resources and the current month's partition cache."""
+    try:
+        pd.get()
+        templates.get().get_template("landing.html")
+        if not supabase:
+            today = dt_date.today()
+            load_bookings(start=month_start(today).isoformat())
+    except Exception as e:
+        print(f"Prewarm error: {e}")
+
+if PREWARM:
+    threading.Thread(target=prewarm, name="prewarm", daemon=True).start()
+
+mark_import("module")
@@ -3,14 +3,26 @@ import pandas as pd
 import calendar
 from datetime import date as dt_date
 import os
+import sys
+import threading
 import urllib.parse
 
+# Approval emails go through the shared dispatcher in api/_notify.py (uploaded next to
+# this file by deploy.py), which only sends when SMTP_HOST and ADMIN_TEAM are configured.
+# Without it the app still works and only shows the draft.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+try:
+    from _notify import ADMIN_TEAM as CONFIGURED_ADMIN_TEAM, notify_admins
+except ImportError:
+    print("_notify.py not found; approval emails are shown as drafts only.")
+    CONFIGURED_ADMIN_TEAM, notify_admins = [], None
+
 # Path to the bookings file
 # Path to the bookings file - use /tmp for Vercel writable access
 BOOKINGS_FILE = "/tmp/bookings.csv" if os.environ.get("VERCEL") else "bookings.csv"
 
-# Admin team list
-ADMIN_TEAM = ["admin1@spjimr.org", "admin2@spjimr.org", "dean_office@spjimr.org"]
+# Admin team list (shown in the draft; the placeholders are never mailed)
+ADMIN_TEAM = CONFIGURED_ADMIN_TEAM or ["admin1@spjimr.org", "admin2@spjimr.org", "dean_office@spjimr.org"]
 
 # SPJIMR Branding Colors
 ORANGE = "#F37021"
@@ -325,6 +337,9 @@ def init_bookings():
             print(f"Error initializing bookings file: {e}")
 
 def load_bookings():
+    return get_snapshot()["df"].copy()
+
+def _read_bookings():
     init_bookings()
     try:
         if os.path.exists(BOOKINGS_FILE) and os.path.getsize(BOOKINGS_FILE) > 0:
@@ -340,6 +355,63 @@ def load_bookings():
         # Ensure we return an empty dataframe even on failure to avoid cascading errors
         return pd.DataFrame(columns=["Venue", "Date", "Time Slot", "Requested By"])
 
+# --- Shared snapshot ---
+# One interaction reads the file at most once. The snapshot is keyed by the file's
+# (mtime, size) plus the month it was rendered for; the calendar fragment, mail
+# template and Gmail button are built lazily and reused until that key changes.
+# Gradio runs events on parallel threads, so a snapshot dict is never changed once
+# published except to add cached outputs; a new one is built and the global rebound.
+# Handlers read it once and pass it along so every output comes from the same frame.
+_snapshot = {"key": None}
+
+def _data_key():
+    try:
+        stat = os.stat(BOOKINGS_FILE)
+        file_key = (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        file_key = None
+    today = dt_date.today()
+    return (file_key, today.year, today.month)
+
+def get_snapshot():
+    snap = _snapshot
+    key = _data_key()
+    if snap["key"] != key or key[0] is None:
+        # Keyed by the stat taken before the read: a write racing the read forces a re-read.
+        snap = _set_snapshot(_read_bookings(), key)
+    return snap
+
+def _set_snapshot(df, key=None):
+    global _snapshot
+    snap = {"key": key or _data_key(), "df": df}
+    _snapshot = snap
+    return snap
+
+def _write_bookings(df):
+    # Write then rename, so a parallel event never reads a half-written file.
+    tmp_path = f"{BOOKINGS_FILE}.{threading.get_ident()}.tmp"
+    df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, BOOKINGS_FILE)
+    return _set_snapshot(df)
+
+def snapshot_calendar_html(snap=None):
+    snap = snap or get_snapshot()
+    if "calendar_html" not in snap:
+        snap["calendar_html"] = generate_calendar_html(snap["df"])
+    return snap["calendar_html"]
+
+def snapshot_mail_template(snap=None):
+    snap = snap or get_snapshot()
+    if "mail_template" not in snap:
+        snap["mail_template"] = generate_mail_template(snap["df"])
+    return snap["mail_template"]
+
+def snapshot_gmail_button_html(snap=None):
+    snap = snap or get_snapshot()
+    if "gmail_html" not in snap:
+        snap["gmail_html"] = get_gmail_button_html(snapshot_mail_template(snap))
+    return snap["gmail_html"]
+
 def generate_calendar_html(df=None):
     if df is None:
         df = load_bookings()
@@ -348,84 +420,86 @@ def generate_calendar_html(df=None):
     year = today.year
     month = today.month
     
-    # Group bookings by day for this month
+    # Group bookings by day for this month (on a parsed copy; the caller's frame is left untouched)
     bookings_by_day = {}
     if not df.empty:
-        df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
-        valid_df = df.dropna(subset=['Date'])
-        month_df = valid_df[(valid_df['Date'].dt.year == year) & (valid_df['Date'].dt.month == month)]
-        
-        for idx, row in month_df.iterrows():
-            d = row['Date'].day
-            if d not in bookings_by_day:
-                bookings_by_day[d] = []
-            bookings_by_day[d].append(f"<b>{row['Venue']}</b><br>{row['Time Slot']}")
+        dates = pd.to_datetime(df['Date'], errors='coerce')
+        in_month = (dates.dt.year == year) & (dates.dt.month == month)
+        for d, venue, slot in zip(dates[in_month].dt.day, df.loc[in_month, 'Venue'], df.loc[in_month, 'Time Slot']):
+            bookings_by_day.setdefault(int(d), []).append(f"<b>{venue}</b><br>{slot}")
 
     cal = calendar.monthcalendar(year, month)
     month_name = calendar.month_name[month]
     
-    html = f'<div class="calendar-widget">'
-    html += f'<div class="calendar-header">{month_name} {year}</div>'
-    html += '<div class="custom-calendar-grid">'
+    parts = ['<div class="calendar-widget">', f'<div class="calendar-header">{month_name} {year}</div>',
+             '<div class="custom-calendar-grid">']
     
     # Day Names
     for day in ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]:
-        html += f'<div class="day-name">{day}</div>'
+        parts.append(f'<div class="day-name">{day}</div>')
     
     # Day Cells
     for week in cal:
         for day in week:
             if day == 0:
-                html += '<div class="day-empty"></div>'
+                parts.append('<div class="day-empty"></div>')
+            elif day in bookings_by_day:
+                details = "".join([f'<div class="detail-item">{item}</div>' for item in bookings_by_day[day]])
+                parts.append(f'<div class="day-cell day-booked">{day}<div class="booking-details">{details}</div></div>')
             else:
-                is_booked = day in bookings_by_day
-                if is_booked:
-                    details = "".join([f'<div class="detail-item">{item}</div>' for item in bookings_by_day[day]])
-                    html += f'<div class="day-cell day-booked">{day}<div class="booking-details">{details}</div></div>'
-                else:
-                    html += f'<div class="day-cell">{day}</div>'
+                parts.append(f'<div class="day-cell">{day}</div>')
     
-    html += '</div>'
-    html += f'<div class="calendar-legend">'
-    html += f'<div class="legend-item"><div class="legend-color" style="background: #F9F9F9; border: 1px solid #EEE;"></div> Available</div>'
-    html += f'<div class="legend-item"><div class="legend-color" style="background: {ORANGE};"></div> reserved</div>'
-    html += '</div></div>'
+    parts.append('</div>')
+    parts.append('<div class="calendar-legend">')
+    parts.append('<div class="legend-item"><div class="legend-color" style="background: #F9F9F9; border: 1px solid #EEE;"></div> Available</div>')
+    parts.append(f'<div class="legend-item"><div class="legend-color" style="background: {ORANGE};"></div> reserved</div>')
+    parts.append('</div></div>')
     
-    return html
+    return "".join(parts)
 
 def save_booking(venue, date, time_slot, requested_by):
+    snap = get_snapshot()
     if not venue or not date or not time_slot or not requested_by:
-        return "Error: All fields are required to process the request.", load_bookings(), generate_mail_template(), generate_calendar_html()
-
+        return "Error: All fields are required to process the request.", snap["df"].copy(), snapshot_mail_template(snap), snapshot_calendar_html(snap), snapshot_gmail_update(snap)
+    
     try:
-        df = load_bookings()
+        df = snap["df"]
         duplicate = df[(df["Venue"] == venue) & (df["Date"] == date) & (df["Time Slot"] == time_slot)]
         if not duplicate.empty:
-            return f"Conflict: {venue} is already reserved for {date} during {time_slot}.", df, generate_mail_template(), generate_calendar_html(df)
-
+            return f"Conflict: {venue} is already reserved for {date} during {time_slot}.", df.copy(), snapshot_mail_template(snap), snapshot_calendar_html(snap), snapshot_gmail_update(snap)
+            
         new_row = {"Venue": venue, "Date": date, "Time Slot": time_slot, "Requested By": requested_by}
         df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
-        df.to_csv(BOOKINGS_FILE, index=False)
-        return f"Confirmed: Slot secured for {venue} on {date}.", df, generate_mail_template(), generate_calendar_html(df)
+        snap = _write_bookings(df)
+        mail = snapshot_mail_template(snap)
+        # Queue the approval email without waiting for it; the footer only lists recipients.
+        if notify_admins:
+            notify_admins(mail.split("\n---\n")[0].strip())
+        return f"Confirmed: Slot secured for {venue} on {date}.", df.copy(), mail, snapshot_calendar_html(snap), snapshot_gmail_update(snap)
     except Exception as e:
-        return f"System Error: Unable to complete booking. {str(e)}", load_bookings(), "Error generating template", generate_calendar_html()
+        return f"System Error: Unable to complete booking. {str(e)}", snap["df"].copy(), "Error generating template", snapshot_calendar_html(snap), gr.update(value="", visible=False)
 
 def delete_booking(row_index):
+    snap = get_snapshot()
     try:
-        df = load_bookings()
+        df = snap["df"]
         if 0 <= row_index < len(df):
             removed_venue = df.iloc[row_index]['Venue']
             removed_date = df.iloc[row_index]['Date']
             df = df.drop(df.index[row_index]).reset_index(drop=True)
-            df.to_csv(BOOKINGS_FILE, index=False)
-            return f"Removed: Reservation for {removed_venue} on {removed_date} has been deleted.", df, generate_calendar_html(df)
-        return "Error: Invalid record selection.", df, generate_calendar_html(df)
+            snap = _write_bookings(df)
+            msg = f"Removed: Reservation for {removed_venue} on {removed_date} has been deleted."
+        else:
+            msg = "Error: Invalid record selection."
     except Exception as e:
-        return f"Error: {str(e)}", load_bookings(), generate_calendar_html()
+        msg = f"Error: {str(e)}"
+    # The mail template and Gmail button come from the same snapshot, so they always agree.
+    return msg, snap["df"].copy(), snapshot_calendar_html(snap), snapshot_mail_template(snap), snapshot_gmail_update(snap)
 
-def generate_mail_template():
+def generate_mail_template(df=None):
     try:
-        df = load_bookings()
+        if df is None:
+            df = get_snapshot()["df"]
         if df.empty:
             return "No recent bookings available. Please secure a slot to generate a template."
         latest = df.iloc[-1]
@@ -492,8 +566,8 @@ def get_gmail_button_html(template):
         return ""
     return f'<a href="{link}" target="_blank" class="gmail-button">Link Gmail</a>'
 
-def update_gmail_button(template):
-    html = get_gmail_button_html(template)
+def snapshot_gmail_update(snap=None):
+    html = snapshot_gmail_button_html(snap)
     if not html:
         return gr.update(value="", visible=False)
     return gr.update(value=html, visible=True)
@@ -563,7 +637,7 @@ with gr.Blocks(title="SPJIMR Venue Management", css=CUSTOM_CSS, theme=gr.themes.
             with gr.Row():
                 with gr.Column(scale=1):
                     gr.Markdown("### Monthly Availability Overview")
-                    calendar_display = gr.HTML(value=generate_calendar_html())
+                    calendar_display = gr.HTML(value=snapshot_calendar_html())
                 with gr.Column(scale=2, elem_classes="main-card"):
                     gr.Markdown("### Institutional Calendar Records")
                     history_table = gr.Dataframe(value=load_bookings(), interactive=False)
@@ -583,48 +657,43 @@ with gr.Blocks(title="SPJIMR Venue Management", css=CUSTOM_CSS, theme=gr.themes.
             with gr.Column(elem_classes="main-card"):
                 gr.Markdown("### Administrative Communication Draft")
                 gr.Markdown("Use this pre-drafted message for official correspondence with the administrative team.")
-                mail_output = gr.TextArea(label="Email Content", value=generate_mail_template(), interactive=False, lines=12)
+                mail_output = gr.TextArea(label="Email Content", value=snapshot_mail_template(), interactive=False, lines=12)
                 with gr.Row(elem_classes="action-button-row"):
                     refresh_mail_btn = gr.Button("Generate Update", elem_id="gen_update_btn")
-                    gmail_btn_html = gr.HTML(value=get_gmail_button_html(generate_mail_template()), elem_id="gmail_link_container")
+                    gmail_btn_html = gr.HTML(value=snapshot_gmail_button_html(), elem_id="gmail_link_container")
 
     gr.Markdown("Created by Debanik Mukherjee", elem_classes="footer-text")
 
     # Define interactions
+    # Each handler works from the shared snapshot and returns every dependent output at once,
+    # so one click is one file read at most and no follow-up event re-parses the template.
     def on_submit(venue, manual, date, time, req_by):
         final_venue = manual if venue == "Other (Manual Entry)" else venue
-        msg, df, mail, cal_html = save_booking(final_venue, date, time, req_by)
-        return msg, df, mail, cal_html
+        return save_booking(final_venue, date, time, req_by)
 
     submit_btn.click(
         on_submit, 
         inputs=[venue_input, manual_venue, date_input, time_input, req_by_input], 
-        outputs=[output_msg, history_table, mail_output, calendar_display]
-    ).then(
-        fn=update_gmail_button,
-        inputs=mail_output,
-        outputs=gmail_btn_html
+        outputs=[output_msg, history_table, mail_output, calendar_display, gmail_btn_html]
     )
-    
+
     def on_refresh():
-        df = load_bookings()
-        cal_html = generate_calendar_html(df)
-        msg = "### Availability Overview\nNo bookings yet for this month." if df.empty else "### Monthly Availability Overview"
-        return df, cal_html
+        snap = get_snapshot()
+        return snap["df"].copy(), snapshot_calendar_html(snap)
+
+    def on_refresh_mail():
+        snap = get_snapshot()
+        return snapshot_mail_template(snap), snapshot_gmail_update(snap)
 
     refresh_btn.click(on_refresh, outputs=[history_table, calendar_display])
     refresh_mail_btn.click(
-        fn=generate_mail_template,
-        outputs=mail_output
-    ).then(
-        fn=update_gmail_button,
-        inputs=mail_output,
-        outputs=gmail_btn_html
+        fn=on_refresh_mail,
+        outputs=[mail_output, gmail_btn_html]
     )
     delete_btn.click(
         fn=delete_booking,
         inputs=delete_index,
-        outputs=[delete_status, history_table, calendar_display]
+        outputs=[delete_status, history_table, calendar_display, mail_output, gmail_btn_html]
     )
 
 if __name__ == "__main__":
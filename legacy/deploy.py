@@ -25,15 +25,18 @@ def deploy():
         print(f"Error creating space: {e}")
         return
 
-    # Files to upload
-    files_to_upload = ["app.py", "requirements.txt", "spjimr_logo.png", "bookings.csv"]
+    # Files to upload (local path, path in the Space); app.py imports _notify from beside it
+    notify_module = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api", "_notify.py")
+    files_to_upload = [("app.py", "app.py"), ("requirements.txt", "requirements.txt"),
+                       ("spjimr_logo.png", "spjimr_logo.png"), ("bookings.csv", "bookings.csv"),
+                       (notify_module, "_notify.py")]
     
-    for file_path in files_to_upload:
+    for file_path, path_in_repo in files_to_upload:
         if os.path.exists(file_path):
             print(f"Uploading {file_path}...")
             api.upload_file(
                 path_or_fileobj=file_path,
-                path_in_repo=file_path,
+                path_in_repo=path_in_repo,
                 repo_id=repo_id,
                 repo_type="space"
             )
@@ -0,0 +1,103 @@
+"""Cold-start regression check for the serverless entry point (api/index.py).
+
+Each trial starts a fresh interpreter with COLD_START_PROFILE=1, imports the app,
+and sends it one request straight through ASGI (no server, no network). It then
+reports the import time, the first-response time and the app's own breakdown.
+The check exits non-zero when the median import or first-response time exceeds
+its budget, so it can gate CI or a pre-deploy hook:
+
+    python scripts/cold_start_check.py --import-budget-ms 800 --first-response-budget-ms 1500
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r"""
+import asyncio, json, sys, time
+started = time.perf_counter()
+sys.path.insert(0, "api")
+import index
+imported = time.perf_counter()
+
+async def call(path):
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+             "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+             "headers": [(b"host", b"localhost")], "client": ("127.0.0.1", 0), "server": ("localhost", 80)}
+    status = {}
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status["code"] = message["status"]
+    await index.app(scope, receive, send)
+    return status.get("code")
+
+code = asyncio.run(call(sys.argv[1]))
+done = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "first_response_ms": (done - imported) * 1000,
+    "status": code,
+    "profile": index.cold_start,
+}))
+"""
+
+
+def run_trial(path, env):
+    result = subprocess.run([sys.executable, "-c", CHILD, path], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fail when api/index.py cold starts exceed a time budget.")
+    parser.add_argument("--path", default="/", help="route to request after import (default: /)")
+    parser.add_argument("--trials", type=int, default=5)
+    parser.add_argument("--import-budget-ms", type=float, default=float(os.environ.get("COLD_START_IMPORT_BUDGET_MS", "1000")))
+    parser.add_argument("--first-response-budget-ms", type=float,
+                        default=float(os.environ.get("COLD_START_FIRST_RESPONSE_BUDGET_MS", "2000")))
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        env = dict(os.environ, COLD_START_PROFILE="1", BOOKINGS_FILE=os.path.join(data_dir, "bookings.csv"))
+        env.pop("PREWARM", None)
+        trials = [run_trial(args.path, env) for _ in range(args.trials)]
+
+    import_ms = statistics.median(t["import_ms"] for t in trials)
+    first_ms = statistics.median(t["first_response_ms"] for t in trials)
+    statuses = {t["status"] for t in trials}
+    last = trials[-1]["profile"]
+
+    print(f"import:         median {import_ms:8.1f} ms  (budget {args.import_budget_ms:.0f} ms)")
+    print(f"first response: median {first_ms:8.1f} ms  (budget {args.first_response_budget_ms:.0f} ms)  status {sorted(statuses)}")
+    print("import stages (ms since import start, ms in stage):")
+    previous = 0.0
+    for stage, ms in last["import_ms"].items():
+        print(f"  {stage:<24} {ms:8.1f}  {ms - previous:+8.1f}")
+        previous = ms
+    print("lazy resources (ms to initialize):")
+    for name, ms in last["resources_ms"].items():
+        print(f"  {name:<24} {ms:8.1f}")
+
+    failures = []
+    if import_ms > args.import_budget_ms:
+        failures.append(f"import {import_ms:.1f} ms > {args.import_budget_ms:.0f} ms")
+    if first_ms > args.first_response_budget_ms:
+        failures.append(f"first response {first_ms:.1f} ms > {args.first_response_budget_ms:.0f} ms")
+    if any(code is None or code >= 500 for code in statuses):
+        failures.append(f"first request failed with status {sorted(statuses, key=str)}")
+    if failures:
+        print("FAIL: " + "; ".join(failures))
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,221 @@
+"""Migrate a legacy Gradio bookings.csv into the current booking store.
+
+The legacy app (legacy/app.py) wrote `Venue, Date, Time Slot, Requested By`.
+The FastAPI app expects `Category, Type, Venue, Date, Time_Slot, Requested_By`.
+This tool streams the legacy file in chunks, renames the columns, normalizes
+dates to YYYY-MM-DD, infers `Category` from the venue catalog (config/venues.json),
+drops slot collisions (same Venue/Date/Time_Slot), and bulk-loads the result.
+
+    python scripts/migrate_legacy.py legacy_bookings.csv --target csv
+    python scripts/migrate_legacy.py legacy_bookings.csv --target sqlite --sqlite-path bookings.db
+    python scripts/migrate_legacy.py legacy_bookings.csv --target supabase
+
+Memory stays flat apart from an 8-byte digest per distinct slot, used for
+de-duplication. The CSV target writes the per-month partitions the app reads,
+so the legacy file may sit at the old BOOKINGS_FILE path; it is left untouched.
+"""
+import argparse
+import hashlib
+import os
+import shutil
+import sqlite3
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+import index  # noqa: E402
+
+COLUMNS = ["Category", "Type", "Venue", "Date", "Time_Slot", "Requested_By"]
+LEGACY_RENAMES = {"Time Slot": "Time_Slot", "Requested By": "Requested_By"}
+
+# The legacy portal only served cultural events, so unknown (manually entered) venues land there.
+DEFAULT_CATEGORY = "cultural"
+
+SQLITE_SCHEMA = """
+create table if not exists bookings (
+    id integer primary key autoincrement,
+    "Category" text not null,
+    "Type" text,
+    "Venue" text not null,
+    "Date" text not null,
+    "Time_Slot" text not null,
+    "Requested_By" text not null,
+    unique ("Venue", "Date", "Time_Slot")
+)
+"""
+
+
+def venue_categories():
+    return dict(index.catalog.current()["venue_category"])
+
+
+def slot_digest(venue, date, time_slot) -> bytes:
+    return hashlib.blake2b(f"{venue}|{date}|{time_slot}".encode(), digest_size=8).digest()
+
+
+def normalize_chunk(chunk, categories, default_category):
+    """Maps one legacy chunk onto the current schema; returns (frame, rows_dropped)."""
+    chunk = chunk.rename(columns=LEGACY_RENAMES)
+    for col in COLUMNS:
+        if col not in chunk.columns:
+            chunk[col] = ""
+    chunk = chunk[COLUMNS].fillna("")
+
+    dates = pd.to_datetime(chunk["Date"].astype(str).str.strip(), errors="coerce", format="mixed")
+    chunk = chunk.assign(Date=dates.dt.strftime("%Y-%m-%d"))
+    for col in ("Venue", "Time_Slot", "Requested_By", "Type"):
+        chunk[col] = chunk[col].astype(str).str.strip()
+
+    missing_category = chunk["Category"].astype(str).str.strip() == ""
+    chunk.loc[missing_category, "Category"] = chunk.loc[missing_category, "Venue"].map(categories).fillna(default_category)
+
+    valid = dates.notna() & (chunk["Venue"] != "") & (chunk["Time_Slot"] != "")
+    return chunk[valid], int((~valid).sum())
+
+
+def dedupe(chunk, seen):
+    keep = []
+    for venue, date, time_slot in zip(chunk["Venue"], chunk["Date"], chunk["Time_Slot"]):
+        digest = slot_digest(venue, date, time_slot)
+        keep.append(digest not in seen)
+        seen.add(digest)
+    return chunk[keep]
+
+
+class CsvTarget:
+    """Streams into temp copies of the month partitions and swaps them in under the cross-worker write lock."""
+
+    def __init__(self, chunksize):
+        index.init_db()
+        self.chunksize = chunksize
+        self.tmp_paths = {}
+        self.lock = index.shared_version.write_lock()
+        self.lock.__enter__()
+
+    def seed(self, seen):
+        """Registers every slot already in the store, archive included."""
+        for path in index.partition_files():
+            for chunk in pd.read_csv(path, chunksize=self.chunksize, dtype=str, keep_default_na=False):
+                for venue, date, time_slot in zip(chunk["Venue"], chunk["Date"], chunk["Time_Slot"]):
+                    seen.add(slot_digest(venue, date, time_slot))
+
+    def write(self, chunk):
+        for path, part in chunk.groupby(chunk["Date"].map(index.partition_path)):
+            tmp_path = self.tmp_paths.get(path)
+            new_file = tmp_path is None and not os.path.exists(path)
+            if tmp_path is None:
+                tmp_path = self.tmp_paths[path] = f"{path}.migrate.tmp"
+                if not new_file:
+                    shutil.copyfile(path, tmp_path)
+            part[COLUMNS].to_csv(tmp_path, mode="w" if new_file else "a", header=new_file, index=False)
+        return len(chunk)
+
+    def close(self, ok):
+        try:
+            for path, tmp_path in self.tmp_paths.items():
+                if ok:
+                    os.replace(tmp_path, path)
+                elif os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            if ok and self.tmp_paths:
+                index.shared_version.bump()
+        finally:
+            self.lock.__exit__(None, None, None)
+
+
+class SqliteTarget:
+    """Bulk-loads into a SQLite database with the same columns and slot constraint as Supabase."""
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(SQLITE_SCHEMA)
+
+    def seed(self, seen):
+        # The unique constraint rejects collisions with existing rows via INSERT OR IGNORE.
+        pass
+
+    def write(self, chunk):
+        before = self.conn.total_changes
+        self.conn.executemany(
+            'insert or ignore into bookings ("Category", "Type", "Venue", "Date", "Time_Slot", "Requested_By") '
+            "values (?, ?, ?, ?, ?, ?)",
+            chunk[COLUMNS].itertuples(index=False, name=None),
+        )
+        self.conn.commit()
+        return self.conn.total_changes - before
+
+    def close(self, ok):
+        self.conn.close()
+
+
+class SupabaseTarget:
+    """Upserts through PostgREST, letting bookings_venue_date_slot_key skip existing slots."""
+
+    def __init__(self):
+        if not index.supabase:
+            raise SystemExit("SUPABASE_URL and SUPABASE_KEY must be set for --target supabase")
+        self.table = index.supabase.table("bookings")
+
+    def seed(self, seen):
+        pass
+
+    def write(self, chunk):
+        rows = chunk[COLUMNS].to_dict("records")
+        response = self.table.upsert(rows, on_conflict="Venue,Date,Time_Slot", ignore_duplicates=True).execute()
+        return len(response.data or [])
+
+    def close(self, ok):
+        pass
+
+
+def migrate(source, target, chunksize=5000, default_category=DEFAULT_CATEGORY, out=sys.stderr):
+    categories = venue_categories()
+    seen = set()
+    stats = {"read": 0, "written": 0, "duplicates": 0, "invalid": 0}
+    started = time.perf_counter()
+    ok = False
+    try:
+        target.seed(seen)
+        for chunk in pd.read_csv(source, chunksize=chunksize, dtype=str, keep_default_na=False):
+            stats["read"] += len(chunk)
+            chunk, invalid = normalize_chunk(chunk, categories, default_category)
+            stats["invalid"] += invalid
+            unique = dedupe(chunk, seen)
+            written = target.write(unique)
+            stats["written"] += written
+            stats["duplicates"] += len(chunk) - written
+            elapsed = time.perf_counter() - started
+            print(f"read {stats['read']:>8}  written {stats['written']:>8}  duplicates {stats['duplicates']:>6}  "
+                  f"invalid {stats['invalid']:>6}  ({stats['read'] / max(elapsed, 1e-9):,.0f} rows/s)", file=out)
+        ok = True
+    finally:
+        target.close(ok)
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("source", help="legacy bookings CSV (Venue, Date, Time Slot, Requested By)")
+    parser.add_argument("--target", choices=["csv", "sqlite", "supabase"], default="csv")
+    parser.add_argument("--sqlite-path", default="bookings.db")
+    parser.add_argument("--chunksize", type=int, default=5000)
+    parser.add_argument("--default-category", choices=list(index.catalog.categories), default=DEFAULT_CATEGORY,
+                        help="category for venues not in the venue catalog")
+    args = parser.parse_args(argv)
+
+    if args.target == "csv":
+        target = CsvTarget(args.chunksize)
+    elif args.target == "sqlite":
+        target = SqliteTarget(args.sqlite_path)
+    else:
+        target = SupabaseTarget()
+
+    stats = migrate(args.source, target, args.chunksize, args.default_category)
+    print(f"Done: {stats['written']} written, {stats['duplicates']} duplicate slots skipped, "
+          f"{stats['invalid']} invalid rows skipped ({stats['read']} read).")
+
+
+if __name__ == "__main__":
+    main()
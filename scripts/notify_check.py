@@ -0,0 +1,173 @@
+"""Delivery check for the notification dispatcher against a local SMTP stand-in.
+
+Starts a minimal in-process SMTP server (stdlib only) that refuses the first
+--fail-first deliveries with a 451, points the app at it, queues a burst of
+approval emails through notify_booking, and checks that:
+
+  * every recipient receives exactly one batched message holding every booking,
+  * the refused deliveries were retried and still arrived,
+  * queueing did not block the caller.
+
+    python scripts/notify_check.py
+    python scripts/notify_check.py --serve 1025   # only run the stand-in and print what it receives
+
+Exits non-zero if any check fails.
+"""
+import argparse
+import os
+import socketserver
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RECIPIENTS = ["approver1@example.test", "approver2@example.test"]
+
+
+class SmtpStandIn(socketserver.ThreadingTCPServer):
+    """Speaks just enough SMTP for smtplib: HELO/EHLO, MAIL, RCPT, DATA, RSET, NOOP, QUIT."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, fail_first=0, echo=False):
+        super().__init__(address, SmtpHandler)
+        self.fail_first = fail_first
+        self.echo = echo
+        self.attempts = 0
+        self.messages = []  # (recipients, raw message)
+        self.lock = threading.Lock()
+
+
+class SmtpHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        server = self.server
+        recipients = []
+        self.reply("220 stand-in ESMTP")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors="replace").strip()
+            verb = command[:4].upper()
+            if verb in ("HELO", "EHLO"):
+                self.reply("250 stand-in")
+            elif verb == "MAIL":
+                with server.lock:
+                    server.attempts += 1
+                    refuse = server.attempts <= server.fail_first
+                if refuse:
+                    self.reply("451 try again later")
+                else:
+                    recipients = []
+                    self.reply("250 OK")
+            elif verb == "RCPT":
+                recipients.append(command.split(":", 1)[1].strip().strip("<>"))
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 end with <CRLF>.<CRLF>")
+                lines = []
+                while True:
+                    data = self.rfile.readline().decode(errors="replace")
+                    if data in ("", ".\r\n", ".\n"):
+                        break
+                    data = data.replace("\r\n", "\n")
+                    lines.append(data[1:] if data.startswith("..") else data)
+                message = "".join(lines)
+                with server.lock:
+                    server.messages.append((recipients, message))
+                if server.echo:
+                    print(f"--- to {', '.join(recipients)}\n{message}", flush=True)
+                self.reply("250 queued")
+            elif verb == "QUIT":
+                self.reply("221 bye")
+                return
+            elif verb in ("RSET", "NOOP"):
+                self.reply("250 OK")
+            else:
+                self.reply("502 not implemented")
+
+
+def start_stand_in(port=0, fail_first=0, echo=False):
+    server = SmtpStandIn(("127.0.0.1", port), fail_first, echo)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check notification batching and retry against an SMTP stand-in.")
+    parser.add_argument("--serve", type=int, metavar="PORT", help="only run the stand-in on PORT")
+    parser.add_argument("--bookings", type=int, default=5, help="bookings queued in one burst")
+    parser.add_argument("--fail-first", type=int, default=2, help="deliveries the stand-in refuses before accepting")
+    parser.add_argument("--timeout", type=float, default=30)
+    args = parser.parse_args(argv)
+
+    if args.serve:
+        server = SmtpStandIn(("127.0.0.1", args.serve), echo=True)
+        print(f"SMTP stand-in listening on 127.0.0.1:{args.serve}")
+        server.serve_forever()
+        return 0
+
+    server = start_stand_in(fail_first=args.fail_first)
+    # The environment has to be in place before api/index.py reads it at import.
+    os.environ.update({
+        "SMTP_HOST": "127.0.0.1",
+        "SMTP_PORT": str(server.server_address[1]),
+        "SMTP_STARTTLS": "0",
+        "ADMIN_TEAM": ",".join(RECIPIENTS),
+        "NOTIFY_WORKERS": "1",
+        "NOTIFY_BATCH_WINDOW": "1",
+        "NOTIFY_MAX_RETRIES": str(args.fail_first + 1),
+    })
+    os.environ.pop("SMTP_USER", None)
+    os.chdir(ROOT)
+    sys.path.insert(0, os.path.join(ROOT, "api"))
+    import index
+
+    bookings = [{"Category": "academic", "Type": "Class Adda", "Venue": "NCR 1", "Date": f"2099-01-{day:02d}",
+                 "Time_Slot": "08:00 AM - 10:00 AM", "Requested_By": f"requester-{day}"}
+                for day in range(1, args.bookings + 1)]
+    started = time.perf_counter()
+    for booking in bookings:
+        index.notify_booking("academic", booking)
+    queued_ms = (time.perf_counter() - started) * 1000
+
+    done = threading.Thread(target=index.notifier.join, daemon=True)
+    done.start()
+    done.join(args.timeout)
+    elapsed = time.perf_counter() - started
+
+    failures = []
+    if done.is_alive():
+        failures.append(f"queue not drained after {args.timeout:.0f} s")
+    if queued_ms > 100:
+        failures.append(f"queueing {len(bookings)} bookings blocked for {queued_ms:.0f} ms")
+    received = {}
+    for recipients, message in server.messages:
+        for recipient in recipients:
+            received.setdefault(recipient, []).append(message)
+    for recipient in RECIPIENTS:
+        messages = received.get(recipient, [])
+        if len(messages) != 1:
+            failures.append(f"{recipient} received {len(messages)} messages, expected 1 batch")
+            continue
+        missing = [b["Requested_By"] for b in bookings if f"Requested By: {b['Requested_By']}\n" not in messages[0]]
+        if missing:
+            failures.append(f"{recipient}'s batch is missing {', '.join(missing)}")
+    if server.attempts < args.fail_first + len(RECIPIENTS):
+        failures.append(f"only {server.attempts} delivery attempts; refused sends were not retried")
+
+    print(f"queued {len(bookings)} bookings in {queued_ms:.1f} ms; {server.attempts} delivery attempts "
+          f"({args.fail_first} refused); {len(server.messages)} messages delivered in {elapsed:.1f} s")
+    if failures:
+        print("FAIL: " + "; ".join(failures))
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,260 @@
+"""Concurrent double-booking stress harness for the booking endpoints.
+
+Fires thousands of concurrent, overlapping POST /book and POST /delete requests
+at the ASGI app (in-process via httpx, optionally from several worker processes
+sharing one store) and then checks the store:
+
+  * no venue/date/slot is ever accepted twice or stored twice,
+  * every accepted booking that was not deleted is stored, with its requester,
+  * every deleted booking is gone, and nothing appears that was never accepted.
+
+Phases: (1) N contenders race for each slot, (2) deletes of half the won slots run
+alongside races for fresh slots, (3) the deleted slots are raced for again.
+Sustained throughput is reported per phase.
+
+    python scripts/stress_booking.py --backend csv --slots 500 --contenders 4 --workers 4
+    python scripts/stress_booking.py --backend supabase   # e.g. supabase/local stand-in
+
+Bookings go into the next three months (inside the app's booking window). The supabase
+backend only touches rows whose requester starts with REQUESTER_PREFIX and removes them
+before and after the run. Exits non-zero if any invariant is violated.
+"""
+import argparse
+import asyncio
+import itertools
+import multiprocessing as mp
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CATEGORY = "academic"
+REQUESTER_PREFIX = "stress-"
+
+_index = None
+
+
+def app_module():
+    """Imports api/index.py lazily so worker processes pick up the harness environment first."""
+    global _index
+    if _index is None:
+        os.chdir(ROOT)
+        sys.path.insert(0, os.path.join(ROOT, "api"))
+        import index
+        _index = index
+    return _index
+
+
+def stress_months():
+    index = app_module()
+    today = index.dt_date.today()
+    return [index.month_start(today, -n) for n in (1, 2, 3)]
+
+
+def stress_range():
+    months = stress_months()
+    index = app_module()
+    return months[0].isoformat(), (index.month_start(months[-1], -1) - index.timedelta(days=1)).isoformat()
+
+
+def make_slots(count, seed):
+    index = app_module()
+    venues = [v for v in index.catalog.categories[CATEGORY]["venues"] if v != index.MANUAL_ENTRY]
+    # Three months, so writes spread over several partitions.
+    dates = [month.replace(day=day).isoformat() for month in stress_months() for day in range(1, 29)]
+    slots = list(itertools.product(venues, dates, index.catalog.time_slots))
+    if count > len(slots):
+        raise SystemExit(f"at most {len(slots)} distinct slots are available")
+    random.Random(seed).shuffle(slots)
+    return slots[:count]
+
+
+def booking_requests(slots, contenders, tag):
+    return [("book", slot, f"{REQUESTER_PREFIX}{tag}-{i}-{n}") for i, slot in enumerate(slots) for n in range(contenders)]
+
+
+async def _send_all(requests, concurrency):
+    import httpx
+    index = app_module()
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=index.app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://stress") as client:
+        async def send(request):
+            kind, (venue, date, time_slot), requester = request
+            async with semaphore:
+                if kind == "book":
+                    data = {"venue": venue, "date": date, "time_slot": time_slot, "requested_by": requester,
+                            "booking_type": "Class Adda"}
+                    response = await client.post(f"/book/{CATEGORY}", data=data)
+                else:
+                    key = index.booking_key({"Venue": venue, "Date": date, "Time_Slot": time_slot})
+                    response = await client.post(f"/delete/{CATEGORY}/0", data={"booking_key": key, "booking_date": date})
+            location = response.headers.get("location", "")
+            if response.status_code == 429:
+                outcome = "rejected"
+            elif response.status_code == 303 and "error=Conflict" in location:
+                outcome = "conflict"
+            elif response.status_code == 303 and "error=" not in location:
+                outcome = "accepted"
+            else:
+                outcome = "error"
+            return request, outcome
+
+        return await asyncio.gather(*(send(r) for r in requests))
+
+
+def run_chunk(args):
+    requests, concurrency = args
+    return asyncio.run(_send_all(requests, concurrency))
+
+
+def run_phase(name, requests, concurrency, pool, workers):
+    random.shuffle(requests)
+    started = time.perf_counter()
+    if pool is None:
+        results = run_chunk((requests, concurrency))
+    else:
+        chunks = [(requests[i::workers], max(1, concurrency // workers)) for i in range(workers)]
+        results = [r for chunk in pool.map(run_chunk, chunks) for r in chunk]
+    elapsed = time.perf_counter() - started
+
+    counts = Counter(outcome for _, outcome in results)
+    accepted_books = sum(1 for (kind, _, _), outcome in results if kind == "book" and outcome == "accepted")
+    print(f"{name:<34} {len(requests):>6} req  {elapsed:7.2f} s  {len(requests) / elapsed:8.1f} req/s  "
+          f"{accepted_books / elapsed:7.1f} bookings/s  "
+          + "  ".join(f"{k} {counts[k]}" for k in ("accepted", "conflict", "rejected", "error")))
+    return results
+
+
+def check_invariants(expected, book_results, deleted):
+    """expected: slot -> requester that should be stored. Returns a list of violations."""
+    index = app_module()
+    violations = []
+
+    winners = defaultdict(list)
+    for (kind, slot, requester), outcome in book_results:
+        if kind == "book" and outcome == "accepted":
+            winners[slot].append(requester)
+    for slot, requesters in winners.items():
+        if len(requesters) > 1:
+            violations.append(f"double-booked (accepted {len(requesters)}x): {slot}")
+
+    start, end = stress_range()
+    df = index.load_bookings(CATEGORY, start=start, end=end)
+    df = df[df["Requested_By"].astype(str).str.startswith(REQUESTER_PREFIX)]
+    stored = Counter(zip(df["Venue"], df["Date"].astype(str), df["Time_Slot"]))
+    stored_by = dict(zip(zip(df["Venue"], df["Date"].astype(str), df["Time_Slot"]), df["Requested_By"]))
+    for slot, n in stored.items():
+        if n > 1:
+            violations.append(f"stored {n}x: {slot}")
+    for slot, requester in expected.items():
+        if slot not in stored:
+            violations.append(f"lost booking: {slot} by {requester}")
+        elif stored_by[slot] != requester:
+            violations.append(f"wrong requester for {slot}: stored {stored_by[slot]}, accepted {requester}")
+    for slot in deleted:
+        if slot in stored and slot not in expected:
+            violations.append(f"deleted booking still stored: {slot}")
+    for slot in stored:
+        if slot not in expected and slot not in deleted:
+            violations.append(f"phantom booking: {slot}")
+    return violations
+
+
+def accepted_requesters(results):
+    return {slot: requester for (kind, slot, requester), outcome in results
+            if kind == "book" and outcome == "accepted"}
+
+
+def clear_stress_rows():
+    index = app_module()
+    if index.supabase:
+        index.supabase.table("bookings").delete().like("Requested_By", f"{REQUESTER_PREFIX}%").execute()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stress the booking endpoints and check for double bookings.")
+    parser.add_argument("--backend", choices=["csv", "supabase"], default="csv")
+    parser.add_argument("--slots", type=int, default=500, help="distinct slots raced for in phase 1 (and again in phase 2)")
+    parser.add_argument("--contenders", type=int, default=4, help="concurrent requests per slot")
+    parser.add_argument("--concurrency", type=int, default=200, help="in-flight requests across all workers")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes sharing the store")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args(argv)
+
+    data_dir = tempfile.mkdtemp(prefix="stress-bookings-")
+    try:
+        # Admission control would otherwise (correctly) turn most of this load into 429s.
+        os.environ.update({
+            "RATE_LIMIT_BURST": "1000000",
+            "RATE_LIMIT_PER_MINUTE": "1000000",
+            "ADMISSION_QUEUE_SIZE": str(args.concurrency * 4),
+            "ADMISSION_TIMEOUT": "300",
+        })
+        if args.backend == "csv":
+            os.environ["BOOKINGS_FILE"] = os.path.join(data_dir, "bookings.csv")
+            os.environ.pop("SUPABASE_URL", None)
+            os.environ.pop("SUPABASE_KEY", None)
+        elif not (os.environ.get("SUPABASE_URL") and os.environ.get("SUPABASE_KEY")):
+            raise SystemExit("SUPABASE_URL and SUPABASE_KEY must be set for --backend supabase")
+
+        index = app_module()
+        clear_stress_rows()
+        slots = make_slots(args.slots * 2, args.seed)
+        first, fresh = slots[:args.slots], slots[args.slots:]
+        random.seed(args.seed)
+
+        pool = mp.get_context("spawn").Pool(args.workers) if args.workers > 1 else None
+        print(f"backend {args.backend}, {args.workers} worker(s), concurrency {args.concurrency}, "
+              f"{args.contenders} contenders per slot, store {index.BOOKINGS_FILE if args.backend == 'csv' else 'supabase'}")
+        try:
+            results = run_phase("1. race for slots", booking_requests(first, args.contenders, "p1"),
+                                args.concurrency, pool, args.workers)
+            expected = accepted_requesters(results)
+            all_results = list(results)
+
+            won = list(expected)
+            random.shuffle(won)
+            deleted = set(won[:len(won) // 2])
+            mixed = [("delete", slot, "") for slot in deleted for _ in range(2)]
+            mixed += booking_requests(fresh, args.contenders, "p2")
+            results = run_phase("2. delete half + race fresh slots", mixed, args.concurrency, pool, args.workers)
+            for slot in deleted:
+                expected.pop(slot)
+            expected.update(accepted_requesters(results))
+            all_results += results
+
+            results = run_phase("3. race for deleted slots", booking_requests(sorted(deleted), args.contenders, "p3"),
+                                args.concurrency, pool, args.workers)
+            rebooked = accepted_requesters(results)
+            expected.update(rebooked)
+            # Phase 1 winners of re-raced slots were legitimately deleted first; only check each race on its own.
+            violations = check_invariants(expected, [r for r in all_results if r[0][1] not in rebooked] + results, deleted)
+            errors = sum(1 for _, outcome in all_results + results if outcome == "error")
+            if errors:
+                violations.append(f"{errors} requests failed with unexpected responses")
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+            clear_stress_rows()
+    finally:
+        # The CSV store only exists for this run.
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    if violations:
+        print(f"FAIL: {len(violations)} invariant violation(s)")
+        for v in violations[:50]:
+            print(f"  {v}")
+        return 1
+    print(f"OK: {len(expected)} bookings stored, no double bookings, nothing lost")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+"""Smoke check for the local Postgres + PostgREST stand-in (supabase/local).
+
+Brings the compose stack up on a fresh database volume, so every migration under
+supabase/migrations runs through the Postgres entrypoint. It then talks to it the way
+the app does (supabase-py through the gateway) and checks that:
+
+  * the migrations were applied (bookings, bookings_archive and bookings_all exist),
+  * a first insert for a venue/date/slot succeeds,
+  * a duplicate insert is rejected by PostgREST with 23505 (unique_violation),
+  * save_booking_data turns that rejection into SlotConflictError,
+  * archive_bookings cannot be called with the anon key (only with the service key).
+
+The stack is torn down afterwards (including its volume) unless --keep is given.
+
+    python scripts/supabase_local_check.py
+    python scripts/supabase_local_check.py --no-up   # against a stack that is already running
+
+Needs Docker with the compose plugin. Exits non-zero if any check fails.
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from datetime import date as dt_date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COMPOSE_FILE = os.path.join(ROOT, "supabase", "local", "docker-compose.yml")
+DEFAULT_URL = "http://localhost:54321"
+# The anon and service_role tokens documented in docker-compose.yml.
+DEFAULT_KEY = ("eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9.eyJyb2xlIjoiYW5vbiJ9."
+               "aQhT8VkXC-Ln34W_4VipoIqNg2Yqa2h4yUK4y7JrJb0")
+DEFAULT_SERVICE_KEY = ("eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9.eyJyb2xlIjoic2VydmljZV9yb2xlIn0."
+                       "jJQHOWoPdYPIuAB049KCIVObWOwwbJS_32z0r-bQnJk")
+REQUESTER = "supabase-local-check"
+
+
+def compose(*args):
+    subprocess.run(["docker", "compose", "-f", COMPOSE_FILE, *args], check=True)
+
+
+def wait_for_rest(url, key, timeout):
+    """Polls the gateway until PostgREST answers for the bookings_all view."""
+    deadline = time.monotonic() + timeout
+    last_error = None
+    while time.monotonic() < deadline:
+        request = urllib.request.Request(f"{url}/rest/v1/bookings_all?limit=1",
+                                         headers={"apikey": key, "Authorization": f"Bearer {key}"})
+        try:
+            with urllib.request.urlopen(request, timeout=5) as response:
+                if response.status == 200:
+                    return
+        except (urllib.error.URLError, OSError) as e:
+            last_error = e
+        time.sleep(1)
+    raise SystemExit(f"PostgREST did not come up within {timeout:.0f} s: {last_error}")
+
+
+def run_checks(index):
+    failures = []
+    table = index.supabase.table("bookings")
+    for name in ("bookings", "bookings_archive", "bookings_all"):
+        try:
+            index.supabase.table(name).select("id").limit(1).execute()
+        except Exception as e:
+            failures.append(f"{name} is not readable (migrations not applied?): {e}")
+
+    # Next month always has a partition (the migrations create the next twelve).
+    day = (dt_date.today().replace(day=1) + timedelta(days=40)).isoformat()
+    row = {"Category": "academic", "Type": "Class Adda", "Venue": "NCR 1", "Date": day,
+           "Time_Slot": "08:00 AM - 10:00 AM", "Requested_By": REQUESTER}
+    table.delete().eq("Requested_By", REQUESTER).execute()
+    try:
+        table.insert(row, returning="minimal").execute()
+    except Exception as e:
+        return failures + [f"first insert failed: {e}"]
+
+    try:
+        table.insert(row, returning="minimal").execute()
+        failures.append("duplicate insert was accepted")
+    except Exception as e:
+        code = getattr(e, "code", None)
+        if code != index.UNIQUE_VIOLATION:
+            failures.append(f"duplicate insert failed with {code!r}, expected {index.UNIQUE_VIOLATION}: {e}")
+
+    try:
+        index.save_booking_data(row["Category"], row["Type"], row["Venue"], row["Date"], row["Time_Slot"], REQUESTER)
+        failures.append("save_booking_data accepted a duplicate")
+    except index.SlotConflictError:
+        pass
+    except Exception as e:
+        failures.append(f"save_booking_data raised {type(e).__name__} instead of SlotConflictError: {e}")
+
+    table.delete().eq("Requested_By", REQUESTER).execute()
+
+    try:
+        index.supabase.rpc("archive_bookings", {"cutoff": "2000-01-01"}).execute()
+        failures.append("archive_bookings is executable with the anon key")
+    except Exception:
+        pass
+    if index.supabase_service:
+        try:
+            index.supabase_service.rpc("archive_bookings", {"cutoff": "2000-01-01"}).execute()
+        except Exception as e:
+            failures.append(f"archive_bookings failed with the service key: {e}")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bring up supabase/local and check the migrations and slot constraint.")
+    parser.add_argument("--no-up", action="store_true", help="use an already running stack; do not start or stop it")
+    parser.add_argument("--keep", action="store_true", help="leave the stack running afterwards")
+    parser.add_argument("--timeout", type=float, default=120, help="seconds to wait for PostgREST")
+    args = parser.parse_args(argv)
+
+    url = os.environ.setdefault("SUPABASE_URL", DEFAULT_URL)
+    key = os.environ.setdefault("SUPABASE_KEY", DEFAULT_KEY)
+    os.environ.setdefault("SUPABASE_SERVICE_KEY", DEFAULT_SERVICE_KEY)
+    if not args.no_up:
+        if not shutil.which("docker"):
+            raise SystemExit("docker is not installed; start the stack elsewhere and pass --no-up")
+        # A fresh volume, so the entrypoint applies every migration again.
+        compose("down", "-v")
+        compose("up", "-d")
+    try:
+        wait_for_rest(url, key, args.timeout)
+        os.chdir(ROOT)
+        sys.path.insert(0, os.path.join(ROOT, "api"))
+        import index
+        failures = run_checks(index)
+    finally:
+        if not args.no_up and not args.keep:
+            compose("down", "-v")
+
+    if failures:
+        print("FAIL: " + "; ".join(failures))
+        return 1
+    print("OK: migrations applied, duplicate slot rejected with 23505, archive_bookings restricted")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,4 @@
+grant usage on schema public to anon, service_role;
+grant select, insert, delete on public.bookings to anon, service_role;
+grant select on public.bookings_archive, public.bookings_all to anon, service_role;
+-- archive_bookings is executable by service_role only (granted in the partitioning migration).
@@ -0,0 +1,7 @@
+-- Roles PostgREST expects; runs before the migrations (files are applied in name order).
+-- Same names as hosted Supabase, so the migrations' grants and revokes apply unchanged.
+create role anon nologin;
+create role authenticated nologin;
+create role service_role nologin;
+create role authenticator noinherit login password 'postgres';
+grant anon, authenticated, service_role to authenticator;
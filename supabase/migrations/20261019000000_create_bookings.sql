@@ -0,0 +1,11 @@
+-- Base bookings table, matching the columns api/index.py reads and writes.
+create table if not exists public.bookings (
+    id bigint generated always as identity primary key,
+    "Category" text not null,
+    "Type" text,
+    "Venue" text not null,
+    "Date" date not null,
+    "Time_Slot" text not null,
+    "Requested_By" text not null,
+    created_at timestamptz not null default now()
+);
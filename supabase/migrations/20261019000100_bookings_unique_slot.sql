@@ -0,0 +1,13 @@
+-- One booking per venue, date and slot. The app relies on this constraint to
+-- reject double bookings in a single insert (a violation surfaces as 23505).
+
+-- Keep the earliest row of any slot that was double-booked before the constraint existed.
+delete from public.bookings a
+using public.bookings b
+where a."Venue" = b."Venue"
+  and a."Date" = b."Date"
+  and a."Time_Slot" = b."Time_Slot"
+  and a.id > b.id;
+
+alter table public.bookings
+    add constraint bookings_venue_date_slot_key unique ("Venue", "Date", "Time_Slot");
@@ -0,0 +1,141 @@
+-- Month-partitioned bookings with a read-only archive for past months.
+--
+-- `bookings` becomes a table range-partitioned on "Date", one partition per month
+-- plus a default partition. Ranged reads filter on "Date", so Postgres prunes them
+-- to the overlapping months. archive_bookings(cutoff) moves whole months before the
+-- cutoff into `bookings_archive`, which clients can only read. The app reads
+-- through the `bookings_all` view and inserts into `bookings`.
+--
+-- The app only accepts dates from the oldest unarchived month through the partition
+-- window, so the default partition is a safety net rather than a place rows live:
+-- ensure_bookings_partition moves a month's rows out of it before attaching that
+-- month, and archive_bookings sweeps anything older than the cutoff out of it.
+
+alter table public.bookings rename to bookings_unpartitioned;
+alter table public.bookings_unpartitioned rename constraint bookings_venue_date_slot_key to bookings_unpartitioned_slot_key;
+
+create table public.bookings (
+    id bigint generated always as identity,
+    "Category" text not null,
+    "Type" text,
+    "Venue" text not null,
+    "Date" date not null,
+    "Time_Slot" text not null,
+    "Requested_By" text not null,
+    created_at timestamptz not null default now(),
+    primary key (id, "Date"),
+    constraint bookings_venue_date_slot_key unique ("Venue", "Date", "Time_Slot")
+) partition by range ("Date");
+
+create table public.bookings_default partition of public.bookings default;
+
+-- Postgres refuses to create a partition while the default partition holds rows for
+-- its range, so the month is built as a plain table, the matching rows are moved out
+-- of the default partition into it, and it is then attached.
+create or replace function public.ensure_bookings_partition(month date)
+returns void
+language plpgsql
+set search_path = public
+as $$
+declare
+    first_day date := date_trunc('month', month)::date;
+    next_day date := (date_trunc('month', month) + interval '1 month')::date;
+    part_name text := format('bookings_%s', to_char(first_day, 'YYYY_MM'));
+begin
+    if to_regclass(format('public.%I', part_name)) is not null then
+        return;
+    end if;
+    -- Blocks inserts that would land in the default partition until the month is attached.
+    lock table public.bookings_default in exclusive mode;
+    execute format('create table public.%I (like public.bookings including defaults)', part_name);
+    execute format(
+        'with moved as (delete from public.bookings_default where "Date" >= %L and "Date" < %L returning *) '
+        'insert into public.%I select * from moved',
+        first_day, next_day, part_name
+    );
+    execute format(
+        'alter table public.bookings attach partition public.%I for values from (%L) to (%L)',
+        part_name, first_day, next_day
+    );
+end;
+$$;
+
+-- Partitions for every month already in use, plus the next twelve.
+select public.ensure_bookings_partition(m::date)
+from generate_series(
+    least(date_trunc('month', (select min("Date") from public.bookings_unpartitioned)), date_trunc('month', now())),
+    date_trunc('month', now()) + interval '12 months',
+    interval '1 month'
+) as m;
+
+insert into public.bookings ("Category", "Type", "Venue", "Date", "Time_Slot", "Requested_By", created_at)
+select "Category", "Type", "Venue", "Date", "Time_Slot", "Requested_By", created_at
+from public.bookings_unpartitioned;
+
+drop table public.bookings_unpartitioned;
+
+create table public.bookings_archive (
+    id bigint,
+    "Category" text not null,
+    "Type" text,
+    "Venue" text not null,
+    "Date" date not null,
+    "Time_Slot" text not null,
+    "Requested_By" text not null,
+    created_at timestamptz not null,
+    constraint bookings_archive_slot_key unique ("Venue", "Date", "Time_Slot")
+);
+
+create view public.bookings_all as
+    select id, "Category", "Type", "Venue", "Date", "Time_Slot", "Requested_By", created_at from public.bookings
+    union all
+    select id, "Category", "Type", "Venue", "Date", "Time_Slot", "Requested_By", created_at from public.bookings_archive;
+
+-- Moves every month partition that ends on or before `cutoff` into the archive and
+-- drops it. Also makes sure upcoming partitions exist. Returns the months archived.
+create or replace function public.archive_bookings(cutoff date)
+returns integer
+language plpgsql
+security definer
+set search_path = public
+as $$
+declare
+    part record;
+    archived integer := 0;
+begin
+    for part in
+        select c.relname as name,
+               to_date(substring(c.relname from 'bookings_(\d{4}_\d{2})$'), 'YYYY_MM') as first_day
+        from pg_inherits i
+        join pg_class c on c.oid = i.inhrelid
+        where i.inhparent = 'public.bookings'::regclass
+          and c.relname ~ '^bookings_\d{4}_\d{2}$'
+    loop
+        if part.first_day + interval '1 month' <= cutoff then
+            execute format(
+                'insert into public.bookings_archive select id, "Category", "Type", "Venue", "Date", "Time_Slot", "Requested_By", created_at from public.%I on conflict do nothing',
+                part.name
+            );
+            execute format('drop table public.%I', part.name);
+            archived := archived + 1;
+        end if;
+    end loop;
+
+    -- Rows that reached the default partition for months already archived (or never partitioned).
+    with moved as (delete from public.bookings_default where "Date" < cutoff returning *)
+    insert into public.bookings_archive
+    select id, "Category", "Type", "Venue", "Date", "Time_Slot", "Requested_By", created_at from moved
+    on conflict do nothing;
+
+    perform public.ensure_bookings_partition(m::date)
+    from generate_series(date_trunc('month', now()), date_trunc('month', now()) + interval '12 months', interval '1 month') as m;
+
+    return archived;
+end;
+$$;
+
+-- Only the service role may run maintenance. Supabase's default privileges grant EXECUTE
+-- on new functions to anon and authenticated directly, so revoking from public is not enough.
+revoke all on function public.archive_bookings(date) from public, anon, authenticated;
+revoke all on function public.ensure_bookings_partition(date) from public, anon, authenticated;
+grant execute on function public.archive_bookings(date) to service_role;